@@ -1,10 +1,10 @@
 import os
 import time
-import numpy as np
 import streamlit as st
 import yaml
 from yaml.loader import SafeLoader
 
+from model.cache import cached_llm, get_llm_cache_stats, without_cache
 from model.gpt.get_model import CustomGPT
 from model.mistral.get_model import instantiate_mixtral
 from utils.llmtools import (
@@ -14,13 +14,33 @@ from utils.llmtools import (
     generate_prompt_title,
     get_init_structure,
     generate_prompt_reformulate_content,
+    generate_prompt_part_content,
     PartContent,
     Summary,
     get_summary,
     Title,
     get_all_content_proposals,
+    record_generation,
+    get_generation_stats,
     generate_prompt_summary,
     generate_structure_proposals,
+    complete_proposals,
+    get_content_generation_config,
+    get_all_content_versions,
+    get_all_content_skeleton,
+    invoke_llm_batch,
+)
+from utils.compression import compress_examples, get_compression_config
+from utils.dag import run_dag
+from utils.keyword_matcher import get_keyword_matcher
+from utils.ratelimit import get_limiter
+from utils.seo_analytics import density_coverage, format_keyword_targets, get_corpus_stats
+from utils.site_index import get_maillage_interne
+from utils.token_budget import (
+    examples_budget,
+    get_token_counter,
+    pack_examples,
+    pack_examples_for_prompt,
 )
 from utils.textformatools import (
     parse_hn_from_dict,
@@ -32,12 +52,11 @@ from utils.textformatools import (
 from utils.tools import (
     parse_semrank_object,
     get_semrank_result,
-    google_search,
-    format_ancre,
     add_hn_label,
     get_complement_keywords,
-    calculate_semantic_score,
     reset_generation,
+    get_semrank_cache,
+    stream_to_placeholder,
 )
 
 # --
@@ -46,20 +65,16 @@ with open("config.yml") as f:
 os.environ["OPENAI_API_URL"] = config["OPENAI_API_URL"]
 
 TOP_CONCURRENTS = config["TOP_CONCURRENTS"]
-TOP_CONTENT_PROMPT = 5  ## TODO => Adapter en fonction de la taille des contenus =>
-# Prévoir :
-#   - 3 contenus à générer + taille prompt == environ 5 * 1500 tokens => 8k tokens environs
-#   - X contenus des concurrents (trouver x) == X * nb_token_moyen_contenu
-#   - max_token === 128k ou 32k suivant le modèle
-#   => 8K + X * nb_token_moyen_contenu = 32k => X = (24k )/nb_token_moyen_contenu
-ADJUST_PARAM_TOP_CONTENT = 24000.0
+SCRAPING = config["SCRAPING"]
+COMPRESSION = get_compression_config()
+CONTENT_GENERATION = get_content_generation_config()
 MAX_LEN_SUMMARY = 200
 version = "0.1"
 font_col_txt = "#6396e2ff"
 
-# => LLM
-gpt_llm = CustomGPT()
-mistral_llm = instantiate_mixtral()
+# => LLM (réponses mises en cache, cf. LLM_CACHE dans config.yml)
+gpt_llm = cached_llm(CustomGPT())
+mistral_llm = cached_llm(instantiate_mixtral())
 
 
 def main():
@@ -97,6 +112,9 @@ def main():
         "n_summary_choix",
         "maillage_interne",
         "init_structure_raw_md",
+        "corpus_stats",
+        "examples_budget",
+        "compression_report",
     ]
     for v in none_args:
         if v not in st.session_state:
@@ -273,10 +291,58 @@ def main():
             # Traitement préliminaires
             # choix du model
             start = time.time()
-            # Recherche mot clé sur semrank
-            results = get_semrank_result(st.session_state.keyword)
-            l_complement_keyword = get_complement_keywords(st.session_state.keyword)
-            parsed_res = parse_semrank_object(results, top_concurrent=TOP_CONCURRENTS)
+            keyword = st.session_state["keyword"]
+            llm = st.session_state["llm"]
+            # Affichage progressif de l'intention de recherche et de la structure initiale
+            intention_placeholder = st.empty()
+            init_structure_placeholder = st.empty()
+
+            # Graphe des recherches : les tâches indépendantes sont lancées en parallèle
+            nodes = {
+                # Recherche mot clé sur semrank
+                "semrank": (lambda: get_semrank_result(keyword), []),
+                "parsed_res": (
+                    lambda results: parse_semrank_object(
+                        results,
+                        top_concurrent=TOP_CONCURRENTS,
+                        max_workers=SCRAPING["MAX_WORKERS"],
+                        timeout=SCRAPING["TIMEOUT"],
+                        deadline=SCRAPING["DEADLINE"],
+                    ),
+                    ["semrank"],
+                ),
+                "complement_keywords": (lambda: get_complement_keywords(keyword), []),
+                # => Intention de recherche puis structure initiale
+                "intention_recherche": (
+                    lambda: get_intention_recherche(
+                        keyword,
+                        llm,
+                        stream_to_placeholder(
+                            intention_placeholder, "**Intention de recherche** : "
+                        ),
+                    ),
+                    [],
+                ),
+                "init_structure": (
+                    lambda intention: get_init_structure(
+                        keyword,
+                        intention,
+                        llm,
+                        stream_to_placeholder(
+                            init_structure_placeholder, "**Structure initiale** :\n\n"
+                        ),
+                    ),
+                    ["intention_recherche"],
+                ),
+                # => Maillage interne
+                "maillage_interne": (lambda: get_maillage_interne(keyword), []),
+            }
+            dag_results, timings = run_dag(nodes)
+            intention_placeholder.empty()
+            init_structure_placeholder.empty()
+
+            results = dag_results["semrank"]
+            parsed_res = dag_results["parsed_res"]
             st.session_state["concurrents_data"] = parsed_res["concurrents_data"]
             # Traitement du résultat
 
@@ -301,37 +367,51 @@ def main():
                 s.split(":")[0]
                 for s in list(results["datas"]["keywords_list"].values())
             ]
-            keywords_list += l_complement_keyword
+            keywords_list += dag_results["complement_keywords"]
             st.session_state["keywords_list"] = ", ".join(keywords_list)
 
             # => Intention de recherche
-            intention_recherche = get_intention_recherche(
-                st.session_state["keyword"], st.session_state["llm"]
-            )
-            st.session_state["intention_recherche"] = intention_recherche
+            st.session_state["intention_recherche"] = dag_results["intention_recherche"]
 
             # => Structure initiale
-            init_structure_raw_md = get_init_structure(
-                st.session_state["keyword"],
-                intention_recherche,
-                st.session_state["llm"],
-            )
-
-            st.session_state["init_structure_raw_md"] = init_structure_raw_md
+            st.session_state["init_structure_raw_md"] = dag_results["init_structure"]
 
             # => Maillage interne
-            results_docaposte_content = google_search(st.session_state.keyword)
-            maillage_interne = format_ancre(results_docaposte_content)
-            st.session_state["maillage_interne"] = maillage_interne.replace(
-                "\n", "\n\n"
-            )
+            st.session_state["maillage_interne"] = dag_results[
+                "maillage_interne"
+            ].replace("\n", "\n\n")
 
             end = time.time()
             response_time_sec = end - start
+            print(f"-- Cache SEMrank : {get_semrank_cache().stats()}")
+            print(f"-- Limiteur HTTP : {get_limiter().stats()}")
+            print(f"-- Cache LLM : {get_llm_cache_stats()}")
+            print(
+                "-- Durées des recherches : "
+                + ", ".join(f"{n} {t:.1f}s" for n, t in timings.items())
+            )
             st.success(f"Données récupérées en {int(response_time_sec)} secondes")
+            st.caption(
+                " | ".join(f"{n} : {t:.1f}s" for n, t in sorted(timings.items()))
+            )
+            if parsed_res["duplicates"]:
+                print(f"-- Pages quasi identiques écartées : {parsed_res['duplicates']}")
+                st.caption(
+                    "Pages quasi identiques écartées : "
+                    + ", ".join(
+                        f"{d['url']} (proche de {d['duplicate_of']})"
+                        for d in parsed_res["duplicates"]
+                    )
+                )
 
             return parsed_res
 
+    def generation_llm(step):
+        """Modèle pour une étape : une génération redemandée (étape déjà prête) ignore les réponses en cache"""
+        if st.session_state[f"{step}_ready"]:
+            return without_cache(st.session_state["llm"])
+        return st.session_state["llm"]
+
     # *********************************************************
     # ===> Proposition de structures
     # *********************************************************
@@ -360,7 +440,8 @@ def main():
                     for i in range(n_concurrents)
                 ]
                 # Chaine
-                chain_structure = build_chain(st.session_state["llm"], StructureHn)
+                llm_structure = generation_llm("structure")
+                chain_structure = build_chain(llm_structure, StructureHn)
                 exs = "\n".join(
                     [
                         "## Début exemple \n" + str(i) + "\n## Fin exemple \n "
@@ -378,6 +459,7 @@ def main():
                             st.session_state["related_questions"],
                             st.session_state["init_structure_raw_md"],
                             n_proposals=3,
+                            llm=llm_structure,
                         )
                     )
 
@@ -402,6 +484,7 @@ def main():
                 st.success(
                     f"Informations traitées en {int(response_time_sec)} secondes"
                 )
+                print(f"-- Appels LLM par génération : {get_generation_stats()}")
 
         else:
             st.error("Veuillez donner un mot clé")
@@ -614,14 +697,6 @@ def main():
         concurrents = st.session_state["concurrents_data"]
 
         concurrents_content = [i["content"] for i in concurrents]
-        concurrents_nb_words = [i["nb_words"] for i in concurrents]
-        len_content = int(
-            np.mean([n for n in concurrents_nb_words if n > 100])
-        )  # Eliminer contenu trop petits
-        top_content_prompt_adjusted = min(
-            int(ADJUST_PARAM_TOP_CONTENT / len_content), len(concurrents)
-        )
-        concurrents_content_limited = concurrents_content[:top_content_prompt_adjusted]
 
         # Mots clés
         mots_cles = st.text_area(
@@ -630,6 +705,15 @@ def main():
             height=100,
         )
 
+        # Statistiques du corpus des concurrents (calculées une fois par mot clé et liste de mots clés)
+        corpus_stats = get_corpus_stats(
+            st.session_state.keyword,
+            concurrents,
+            [s.strip() for s in mots_cles.split(",") if s.strip()],
+        )
+        st.session_state["corpus_stats"] = corpus_stats
+        len_content = max(corpus_stats["len_content"], 1)  # Contenus trop petits éliminés
+
         # Question fréquentes
         related_questions = st.text_area(
             "Autres questions fréquentes des internautes :",
@@ -655,12 +739,13 @@ def main():
         contenu </p>"""
         st.markdown(txt, unsafe_allow_html=True)
         with st.expander("Afficher les inputs"):
-            tab1_content, tab2_content, tab3_content, tab4_content = st.tabs(
+            tab1_content, tab2_content, tab3_content, tab4_content, tab5_content = st.tabs(
                 [
                     "Mots clés",
                     "Autres questions posées",
                     "Maillage interne",
                     "Intention de recherche",
+                    "Analyse des concurrents",
                 ]
             )
 
@@ -680,52 +765,202 @@ def main():
             with tab4_content:
                 st.markdown(intention_recherche)
 
+            # Analyse des concurrents
+            with tab5_content:
+                sections_stats = corpus_stats["sections"]
+                st.markdown(
+                    f"**Nombre de mots cible** : {corpus_stats['len_content']}  \n"
+                    f"**Longueur des sections** : médiane {int(sections_stats['median'])} mots "
+                    f"(de {int(sections_stats['p25'])} à {int(sections_stats['p75'])})  \n"
+                    "**Nombre moyen de titres** : "
+                    + ", ".join(
+                        f"H{i + 1} {n:.1f}"
+                        for i, n in enumerate(corpus_stats["headings"]["mean_per_level"])
+                        if n > 0
+                    )
+                    + "  \n**Termes importants** : "
+                    + ", ".join(t for t, _ in corpus_stats["top_terms"])
+                )
+                st.markdown(
+                    "**Occurrences visées** : "
+                    + format_keyword_targets(
+                        corpus_stats, list(corpus_stats["keywords"]), len_content
+                    )
+                )
+
         # ****===> Génération
+        compress_examples_on = st.checkbox(
+            "Ne garder que les passages des concurrents les plus proches du sujet",
+            value=COMPRESSION["ENABLED"],
+            key="compress_examples",
+        )
         if st.button("Générer un contenu", key="generate_content"):
             with st.spinner(
                 "Génération des propositions de contenu. Le traitement peut prendre quelques minutes ..."
             ):
                 start = time.time()
-                exs = "\n".join(
-                    [
-                        "## Début exemple \n" + str(i) + "\n## Fin exemple \n "
-                        for i in concurrents_content_limited
-                    ]
-                )
+                llm_content = generation_llm("content")
                 st.session_state["keywords_list"] = mots_cles
                 st.session_state["related_questions"] = related_questions
                 st.session_state["maillage_interne"] = maillage_interne
                 st.session_state["intention_recherche"] = intention_recherche
 
-                chain_part_content = build_chain(st.session_state["llm"], PartContent)
-
-                # Loop over sections to generate content
-                # => First draft of content
-                try:
-                    draft_content_proposals = get_all_content_proposals(
-                        chain_part_content,
+                # => Exemples des concurrents : réserver les tokens du plus gros prompt qui les contient (rédaction
+                # de la dernière section avec les 3 versions du brouillon, ou reformulation avec le brouillon et le
+                # maillage), puis remplir le reste de la fenêtre du modèle
+                model_key = "mistral" if model_choice == "mistral" else "gpt"
+                token_counter = get_token_counter(model_key)
+                tokens_per_word = token_counter.count(
+                    " ".join(concurrents_content)
+                ) / max(sum(len(c.split()) for c in concurrents_content), 1)
+                draft_tokens = int(len_content * max(tokens_per_word, 1))
+                # Début d'article dans le prompt de rédaction d'une section : 3 brouillons complets, ou 3 contextes
+                # bornés (résumé courant et dernière section) en mode rolling
+                article_start_tokens = 3 * draft_tokens
+                if CONTENT_GENERATION["CONTEXT_MODE"] == "rolling":
+                    n_sections = max(len(st.session_state["selected_structure"]) - 1, 1)
+                    article_start_tokens = 3 * int(
+                        (CONTENT_GENERATION["SUMMARY_WORDS"] + len_content / n_sections)
+                        * max(tokens_per_word, 1)
+                    )
+                if CONTENT_GENERATION["ENGINE"] == "versions":
+                    # Une seule version du début de l'article par prompt
+                    article_start_tokens //= 3
+                elif CONTENT_GENERATION["ENGINE"] == "skeleton":
+                    # Plan de l'article avec le brief des sections (quelques phrases par section)
+                    article_start_tokens = int(
+                        80 * len(st.session_state["selected_structure"]) * max(tokens_per_word, 1)
+                    )
+                part_content_tokens = token_counter.count(
+                    generate_prompt_part_content(
                         st.session_state.keyword,
                         st.session_state["selected_structure"],
-                        exs,
+                        "",
                         st.session_state["intention_recherche"],
                         st.session_state["keywords_list"],
                         st.session_state["related_questions"],
                     )
+                )
+                reformulate_tokens = token_counter.count(
+                    generate_prompt_reformulate_content(
+                        st.session_state.keyword,
+                        st.session_state["selected_structure"],
+                        "",
+                        len_content,
+                        st.session_state["intention_recherche"],
+                        format_keyword_targets(
+                            corpus_stats,
+                            [s.strip() for s in mots_cles.split(",") if s.strip()],
+                            len_content,
+                        ),
+                        st.session_state["related_questions"],
+                        st.session_state["maillage_interne"],
+                    )
+                )
+                reserved_tokens = max(
+                    part_content_tokens + article_start_tokens,
+                    reformulate_tokens + draft_tokens,
+                )
+                examples = concurrents_content
+                st.session_state["compression_report"] = None
+                if compress_examples_on:
+                    # => Compression extractive : passages les plus proches du sujet, des questions et des mots clés
+                    examples, compression_report = compress_examples(
+                        concurrents_content,
+                        " ".join([st.session_state.keyword, related_questions, mots_cles]),
+                        token_counter,
+                        min(
+                            COMPRESSION["TOKEN_BUDGET"],
+                            examples_budget(model_key, reserved_tokens),
+                        ),
+                        COMPRESSION["PASSAGE_WORDS"],
+                    )
+                    # Comparaison avec les exemples bruts qui auraient été mis dans les prompts
+                    _, raw_report = pack_examples(
+                        concurrents_content,
+                        examples_budget(model_key, reserved_tokens),
+                        token_counter,
+                    )
+                    # Les exemples sont répétés dans chaque appel de rédaction de section et de reformulation (et
+                    # dans le brief du moteur skeleton) ; une section est rédigée 3 fois hors moteur séquentiel
+                    n_sections = len(st.session_state["selected_structure"]) - 1
+                    if CONTENT_GENERATION["ENGINE"] == "versions":
+                        n_calls = 3 * n_sections + 3
+                    elif CONTENT_GENERATION["ENGINE"] == "skeleton":
+                        n_calls = 1 + 3 * n_sections + 3
+                    else:
+                        n_calls = n_sections + 3
+                    compression_report.update(
+                        raw_prompt_tokens=raw_report["used"], n_calls=n_calls
+                    )
+                    st.session_state["compression_report"] = compression_report
+                exs, examples_report = pack_examples_for_prompt(
+                    model_key, examples, reserved_tokens
+                )
+                st.session_state["examples_budget"] = examples_report
+                if not examples_report["exact"]:
+                    st.warning(
+                        "Tokenizer du modèle indisponible (cf. TOKEN_BUDGET dans config.yml) : le budget de tokens "
+                        "des exemples est estimé d'après le nombre de caractères"
+                    )
+                if st.session_state["compression_report"]:
+                    compression_report = st.session_state["compression_report"]
+                    compression_report["prompt_tokens"] = examples_report["used"]
+                    print(
+                        f"-- Compression des exemples : {compression_report['raw_prompt_tokens']} => "
+                        f"{compression_report['prompt_tokens']} tokens par appel, "
+                        f"{compression_report['n_calls']} appels, détail {compression_report['examples']}"
+                    )
+
+                # Loop over sections to generate content
+                # => First draft of content
+                try:
+                    if CONTENT_GENERATION["ENGINE"] == "versions":
+                        # 3 rédactions indépendantes (exemples, transitions, détails) en parallèle
+                        draft_content_proposals = get_all_content_versions(
+                            llm_content,
+                            st.session_state.keyword,
+                            st.session_state["selected_structure"],
+                            exs,
+                            st.session_state["intention_recherche"],
+                            st.session_state["keywords_list"],
+                            st.session_state["related_questions"],
+                        )
+                    elif CONTENT_GENERATION["ENGINE"] == "skeleton":
+                        # Brief de toutes les sections, rédaction des sections en parallèle puis transitions
+                        draft_content_proposals = get_all_content_skeleton(
+                            llm_content,
+                            st.session_state.keyword,
+                            st.session_state["selected_structure"],
+                            exs,
+                            st.session_state["intention_recherche"],
+                            st.session_state["keywords_list"],
+                            st.session_state["related_questions"],
+                        )
+                    else:
+                        chain_part_content = build_chain(llm_content, PartContent)
+                        draft_content_proposals = get_all_content_proposals(
+                            chain_part_content,
+                            st.session_state.keyword,
+                            st.session_state["selected_structure"],
+                            exs,
+                            st.session_state["intention_recherche"],
+                            st.session_state["keywords_list"],
+                            st.session_state["related_questions"],
+                            llm=llm_content,
+                        )
                     # => Prompt for rephrasing
                     # Supplement prompt pour le style
                     supplement_prompt = [
-                        "15. " + s
-                        for s in [
-                            "L'article final doit ABSOLUMENT contenir plusieurs exemples. Certains exemples doivent être "
-                            "basés sur des personas. Par exemple, lorsque l’on parle des documents à signer, on pourrait "
-                            "illustrer cela avec le cas d’un RH qui utilise la signature électronique pour simplifier la "
-                            "gestion des contrats de travail. Les exemples doivent être présentées de manière subtile, en "
-                            "évitant d'utiliser tout le temps l'expression 'Par exemple ... '.",
-                            "L'article final doit ABSOLUMENT avoir des transitions originales entres les parties et "
-                            "sous-parties. Ces transitions doivent annoncer la suite du texte d'une manière enthousiaste",
-                            "L'article final doit ABSOLUMENT être très détaillé dans les explications. La tonalité doit "
-                            "être légèrement formelle, mais accessible et enthousiaste",
-                        ]
+                        "L'article final doit ABSOLUMENT contenir plusieurs exemples. Certains exemples doivent être "
+                        "basés sur des personas. Par exemple, lorsque l’on parle des documents à signer, on pourrait "
+                        "illustrer cela avec le cas d’un RH qui utilise la signature électronique pour simplifier la "
+                        "gestion des contrats de travail. Les exemples doivent être présentées de manière subtile, en "
+                        "évitant d'utiliser tout le temps l'expression 'Par exemple ... '.",
+                        "L'article final doit ABSOLUMENT avoir des transitions originales entres les parties et "
+                        "sous-parties. Ces transitions doivent annoncer la suite du texte d'une manière enthousiaste",
+                        "L'article final doit ABSOLUMENT être très détaillé dans les explications. La tonalité doit "
+                        "être légèrement formelle, mais accessible et enthousiaste",
                     ]
                     prompt_reformulate_content = [
                         generate_prompt_reformulate_content(
@@ -734,7 +969,11 @@ def main():
                             exs,
                             len_content,
                             st.session_state["intention_recherche"],
-                            st.session_state["keywords_list"],
+                            format_keyword_targets(
+                                corpus_stats,
+                                [s.strip() for s in mots_cles.split(",") if s.strip()],
+                                len_content,
+                            ),
                             st.session_state["related_questions"],
                             st.session_state["maillage_interne"],
                             a,
@@ -742,13 +981,29 @@ def main():
                         )
                         for a, s in zip(draft_content_proposals, supplement_prompt)
                     ]
+                    print(
+                        "-- Tokens des prompts de reformulation : "
+                        f"{[token_counter.count(p) for p in prompt_reformulate_content]}"
+                    )
 
-                    # => Rephrase & Final content
-                    st.session_state.content_suggests = [
-                        st.session_state["llm"].invoke(p)
-                        for p in prompt_reformulate_content
-                    ]
-                    if len(st.session_state.content_suggests) < 3:
+                    # => Rephrase & Final content : les 3 reformulations en parallèle, une réponse manquante
+                    # (échec ou délai dépassé) n'empêche pas d'afficher les autres
+                    content_placeholders = [st.empty() for _ in prompt_reformulate_content]
+                    content_suggests = invoke_llm_batch(
+                        llm_content,
+                        prompt_reformulate_content,
+                        [
+                            stream_to_placeholder(placeholder, f"**Proposition {i + 1}**\n\n")
+                            for i, placeholder in enumerate(content_placeholders)
+                        ],
+                        kind="reformulation",
+                        max_concurrency=CONTENT_GENERATION["MAX_CONCURRENCY"],
+                        timeout=CONTENT_GENERATION["CALL_TIMEOUT"],
+                    )
+                    for placeholder in content_placeholders:
+                        placeholder.empty()
+                    st.session_state.content_suggests = [c or "" for c in content_suggests]
+                    if not any(st.session_state.content_suggests):
                         st.error(
                             "Erreur dans la génération de contenu, Veuillez réessayer"
                         )
@@ -764,6 +1019,43 @@ def main():
             end = time.time()
             response_time_sec = end - start
             st.success(f"Contenus générés en {int(response_time_sec)} secondes")
+            llm_cache_stats = get_llm_cache_stats()
+            print(f"-- Cache LLM : {llm_cache_stats}")
+            print(f"-- Appels LLM par génération : {get_generation_stats()}")
+            st.caption(
+                f"Cache LLM : {int(100 * llm_cache_stats['hit_rate'])} % de réponses en cache, "
+                f"{llm_cache_stats['saved_seconds']} s de génération économisées | Appels LLM : "
+                + ", ".join(
+                    f"{kind} {stats['requests']} dont {stats['invalid']} relancés"
+                    for kind, stats in get_generation_stats().items()
+                )
+            )
+            examples_report = st.session_state["examples_budget"]
+            n_kept = len([d for d in examples_report["examples"] if d["kept_tokens"]])
+            st.caption(
+                f"Exemples concurrents : {n_kept}/{len(examples_report['examples'])} gardés, "
+                f"{examples_report['used']}/{examples_report['budget']} tokens "
+                f"({'tokenizer' if examples_report['exact'] else 'estimation'})"
+            )
+            compression_report = st.session_state["compression_report"]
+            if compression_report:
+                raw_tokens = compression_report["raw_prompt_tokens"]
+                saved = raw_tokens - compression_report["prompt_tokens"]
+                with st.expander("Compression des exemples concurrents"):
+                    st.markdown(
+                        f"**Tokens par appel** : {raw_tokens} sans compression, "
+                        f"{compression_report['prompt_tokens']} avec "
+                        f"({int(100 * saved / raw_tokens) if raw_tokens else 0} % économisés, "
+                        f"soit {saved * compression_report['n_calls']} tokens sur "
+                        f"{compression_report['n_calls']} appels)\n\n"
+                        "| Concurrent | Tokens | Tokens gardés | Passages gardés |\n"
+                        "|---|---|---|---|\n"
+                        + "\n".join(
+                            f"| {d['index'] + 1} | {d['tokens']} | {d['kept_tokens']} | "
+                            f"{d['kept_passages']}/{d['passages']} |"
+                            for d in compression_report["examples"]
+                        )
+                    )
 
     # Affichage résultat
     if st.session_state["content_ready"]:
@@ -773,8 +1065,13 @@ def main():
 
         def afficher_proposition(proposition_num, content, keywords_list):
 
-            sem_score = calculate_semantic_score(content, keywords_list)
+            # Score sémantique et densité des mots clés en un seul parcours du texte
+            analysis = get_keyword_matcher(tuple(keywords_list)).analyze(content)
+            sem_score = analysis["score"]
             len_text = len(content.split())
+            density_score = density_coverage(
+                st.session_state["corpus_stats"], analysis["counts"], len_text
+            )
             expand = (
                 (st.session_state["n_content_choix"] == str(proposition_num))
                 if st.session_state["n_content_choix"]
@@ -782,7 +1079,8 @@ def main():
             )
 
             with st.expander(
-                f"Proposition {proposition_num} | Score sémantique : {sem_score} | Nb mots ≃ {len_text}",
+                f"Proposition {proposition_num} | Score sémantique : {sem_score} | "
+                f"Densité : {density_score} % | Nb mots ≃ {len_text}",
                 expanded=expand,
             ):
                 # Utilisation de st.text_area pour rendre le contenu éditable
@@ -802,13 +1100,17 @@ def main():
                 if actualiser_score_btn:
                     # Recalculer les nouvelles valeurs avec le contenu édité
                     new_len_text = len(edited_content.split())
-                    new_sem_score = calculate_semantic_score(
-                        edited_content, keywords_list
+                    new_analysis = get_keyword_matcher(tuple(keywords_list)).analyze(
+                        edited_content
                     )
 
                     # Afficher les nouvelles valeurs recalculées
                     st.write(f"Nouvelle longueur du texte : {new_len_text} mots")
-                    st.write(f"Nouveau score sémantique : {new_sem_score}")
+                    st.write(f"Nouveau score sémantique : {new_analysis['score']}")
+                    st.write(
+                        "Nouvelle densité des mots clés : "
+                        f"{density_coverage(st.session_state['corpus_stats'], new_analysis['counts'], new_len_text)} %"
+                    )
 
                 # Bouton de sélection
                 prop_content_btn = st.button(
@@ -825,19 +1127,17 @@ def main():
                     reset_generation(step="content")
 
         # Affichage des colonnes et des propositions
-        c_c1, c_c2, c_c3 = st.columns(3)
-
-        # Proposition 1
-        with c_c1:
-            afficher_proposition(1, content_suggests[0], keywords_list)
-
-        # Proposition 2
-        with c_c2:
-            afficher_proposition(2, content_suggests[1], keywords_list)
-
-        # Proposition 3
-        with c_c3:
-            afficher_proposition(3, content_suggests[2], keywords_list)
+        for proposition_num, (column, content) in enumerate(
+            zip(st.columns(3), content_suggests), start=1
+        ):
+            with column:
+                if content:
+                    afficher_proposition(proposition_num, content, keywords_list)
+                else:
+                    st.warning(
+                        f"Proposition {proposition_num} indisponible (échec ou délai dépassé), "
+                        "veuillez relancer la génération"
+                    )
 
         if len(st.session_state["selected_content"]) > 1:
             txt = f"""<p style="color:{font_col_txt}; font-size: 15px;">Proposition de contenu 
@@ -877,16 +1177,20 @@ def main():
             "secondes ..."
         ):
             start = time.time()
-            chain_title = build_chain(st.session_state["llm"], Title)
+            llm_title = generation_llm("title")
+            chain_title = build_chain(llm_title, Title)
             prompt_title = generate_prompt_title(
                 st.session_state.keyword, st.session_state["selected_content"], exs
             )
 
             try:
                 res_title_llm = chain_title.invoke({"query": prompt_title})
-                st.session_state.title_suggests = res_title_llm.title
+                record_generation("title", len(res_title_llm.title) >= 3)
+                st.session_state.title_suggests = complete_proposals(
+                    llm_title, Title, prompt_title, res_title_llm.title, "title"
+                )
 
-                if len(res_title_llm.title) < 3:
+                if len(st.session_state.title_suggests) < 3:
                     st.error("Erreur dans la génération du titre, veuillez réessayer")
                     st.session_state["title_ready"] = False
                 else:
@@ -894,6 +1198,7 @@ def main():
             except:
                 st.error("Erreur dans la génération du titre, veuillez réessayer")
                 st.session_state["title_ready"] = False
+                record_generation("title", False)
 
             st.session_state["n_title_choix"] = None
 
@@ -998,7 +1303,8 @@ def main():
             "Génération des propositions de résumé. Le traitement peut prendre quelques secondes ..."
         ):
             start = time.time()
-            chain_summary = build_chain(st.session_state["llm"], Summary)
+            llm_summary = generation_llm("summary")
+            chain_summary = build_chain(llm_summary, Summary)
 
             prompt_summary = generate_prompt_summary(
                 subject=st.session_state.keyword,
@@ -1009,7 +1315,7 @@ def main():
             )
 
             st.session_state.summary_suggests = get_summary(
-                prompt_summary=prompt_summary, chain_summary=chain_summary, st=st
+                prompt_summary=prompt_summary, chain_summary=chain_summary, st=st, llm=llm_summary
             )
             st.session_state["n_summary_choix"] = None
 
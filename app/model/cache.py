@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM, BaseLLM
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+
+from model.gpt.get_model import ERROR_MESSAGE
+from utils.cache import SqliteCache
+from utils.config import load_config
+
+DEFAULT_LLM_CACHE_CONFIG = {
+    "ENABLED": True,
+    "PATH": "app/data/cache.sqlite",
+    "TTL": 604800,
+    "MAX_SIZE_MB": 200,
+}
+
+
+def get_llm_cache_config() -> dict:
+    return {**DEFAULT_LLM_CACHE_CONFIG, **load_config().get("LLM_CACHE", {})}
+
+
+@lru_cache
+def get_llm_cache() -> SqliteCache:
+    """Cache des réponses des LLM, partagé par les deux modèles (table llm du cache SQLite)"""
+    config = get_llm_cache_config()
+    cache = SqliteCache(
+        config["PATH"],
+        table="llm",
+        ttl=config["TTL"],
+        max_size=config["MAX_SIZE_MB"] * 1024 * 1024,
+        compress=True,
+    )
+    # Temps de génération et caractères économisés grâce aux réponses servies depuis le cache
+    cache.saved_seconds = 0.0
+    cache.saved_chars = 0
+
+    return cache
+
+
+def get_llm_cache_stats() -> dict:
+    cache = get_llm_cache()
+    return {**cache.stats(), "saved_seconds": round(cache.saved_seconds, 1), "saved_chars": cache.saved_chars}
+
+
+class CachedLLM(LLM):
+    """
+    LLM qui sert les réponses déjà générées depuis le cache SQLite, et délègue les autres au modèle enveloppé.
+
+    La clé de cache dépend du modèle, de ses paramètres d'échantillonnage (température, max_tokens...), du prompt,
+    des mots d'arrêt et des paramètres de l'appel. Les messages d'erreur et les réponses vides ne sont pas mis en
+    cache. Pour un appel, bypass_cache=True force une nouvelle génération (dont la réponse remplace celle du cache),
+    par exemple llm.invoke(prompt, bypass_cache=True) ; avec refresh=True, tous les appels du modèle le font (cf.
+    without_cache).
+    """
+
+    llm: BaseLLM
+    refresh: bool = False
+
+    def cache_key(self, prompt, stop=None, kwargs=None) -> str:
+        key = json.dumps(
+            {
+                "llm_type": self.llm._llm_type,
+                "params": self.llm._identifying_params,
+                "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+                "stop": stop,
+                # Paramètres propres à l'appel (format de sortie guidé...), hors délai de la requête
+                "kwargs": {k: v for k, v in (kwargs or {}).items() if k != "timeout"},
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return "llm:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def lookup(self, key, bypass_cache=False):
+        """Réponse en cache (None si absente ou ignorée), avec mise à jour des compteurs"""
+        cache = get_llm_cache()
+        cached = None if bypass_cache or self.refresh else cache.get(key)
+        if cached is None:
+            cache.record("misses")
+            return None
+        value, _ = cached
+        cache.record("hits")
+        cache.record("saved_seconds", value["duration"])
+        cache.record("saved_chars", len(value["text"]))
+
+        return value["text"]
+
+    def store(self, key, text, duration):
+        if text.strip() and text != ERROR_MESSAGE:
+            get_llm_cache().set(key, {"text": text, "duration": duration})
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        bypass_cache: bool = False,
+        **kwargs: Any,
+    ) -> str:
+        key = self.cache_key(prompt, stop, kwargs)
+        text = self.lookup(key, bypass_cache)
+        if text is None:
+            start = time.time()
+            text = self.llm.invoke(prompt, stop=stop, **kwargs)
+            self.store(key, text, time.time() - start)
+
+        return text
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        bypass_cache: bool = False,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """
+        Une réponse en cache est renvoyée en un seul fragment ; sinon les fragments du modèle sont relayés. La
+        réponse n'est mise en cache que si le flux est allé jusqu'au bout (ni erreur ni interruption par l'appelant).
+        """
+        key = self.cache_key(prompt, stop, kwargs)
+        text = self.lookup(key, bypass_cache)
+        start = time.time()
+        chunk_texts = [text] if text is not None else self.llm.stream(prompt, stop=stop, **kwargs)
+        received = ""
+        for chunk_text in chunk_texts:
+            received += chunk_text
+            chunk = GenerationChunk(text=chunk_text)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+
+            yield chunk
+
+        # Atteint seulement si le flux s'est terminé normalement
+        if text is None:
+            self.store(key, received, time.time() - start)
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        bypass_cache: bool = False,
+        **kwargs: Any,
+    ) -> str:
+        key = self.cache_key(prompt, stop, kwargs)
+        text = self.lookup(key, bypass_cache)
+        if text is None:
+            start = time.time()
+            text = await self.llm.ainvoke(prompt, stop=stop, **kwargs)
+            self.store(key, text, time.time() - start)
+
+        return text
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Les prompts d'un abatch sont traités en parallèle (cf. CustomGPT._agenerate)"""
+        texts = await asyncio.gather(
+            *[self._acall(prompt, stop=stop, run_manager=run_manager, **kwargs) for prompt in prompts]
+        )
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        bypass_cache: bool = False,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        key = self.cache_key(prompt, stop, kwargs)
+        text = self.lookup(key, bypass_cache)
+        if text is not None:
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            return
+
+        start = time.time()
+        received = ""
+        async for chunk_text in self.llm.astream(prompt, stop=stop, **kwargs):
+            received += chunk_text
+            chunk = GenerationChunk(text=chunk_text)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+
+            yield chunk
+
+        # Atteint seulement si le flux s'est terminé normalement (cf. _stream)
+        self.store(key, received, time.time() - start)
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.llm._identifying_params
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.llm._llm_type}"
+
+
+def cached_llm(llm):
+    """Envelopper un LLM dans le cache de réponses, sauf si LLM_CACHE.ENABLED est faux dans config.yml"""
+    if not get_llm_cache_config()["ENABLED"]:
+        return llm
+    return CachedLLM(llm=llm)
+
+
+def without_cache(runnable):
+    """
+    Variante d'un LLM ou d'une chaîne (cf. llmtools.build_chain) qui ne sert pas les réponses du cache : les
+    nouvelles réponses remplacent celles du cache. Pour les relances après une réponse inexploitable, qui sinon
+    renverraient la même réponse, et pour les générations redemandées depuis l'interface.
+
+    Args:
+        runnable: LLM, LLM lié à des paramètres d'appel (llm.bind) ou chaîne prompt | llm | parser
+
+    Returns: la variante, ou le runnable tel quel s'il ne contient pas de CachedLLM
+
+    """
+    if isinstance(runnable, CachedLLM):
+        return CachedLLM(llm=runnable.llm, refresh=True)
+    if isinstance(runnable, RunnableBinding):
+        return runnable.copy(update={"bound": without_cache(runnable.bound)})
+    if isinstance(runnable, RunnableSequence):
+        return RunnableSequence(*[without_cache(step) for step in runnable.steps])
+    return runnable
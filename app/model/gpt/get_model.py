@@ -1,48 +1,150 @@
-import urllib.request
+import asyncio
 import json
 
 import yaml
 from yaml.loader import SafeLoader
 from dotenv import load_dotenv
 import os
-from typing import Any, Dict, Iterator, List, Mapping, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional
 
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.llms import LLM
-from langchain_core.outputs import GenerationChunk
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+
+from model.gpt.transport import get_transport
 
 load_dotenv()
 
+ERROR_MESSAGE = "Désolé, une erreur a été rencontrée, je ne peux pas répondre à votre question."
+# Passe à False si le déploiement refuse response_format (JSON mode non supporté) : le paramètre n'est plus envoyé
+json_mode_supported = True
+
+
+def build_openai_request(prompt, stream=False, response_format=None):
+    url = os.environ["OPENAI_API_URL"]
+
+    hdr = {
+        # Request headers
+        "Content-Type": "application/json",
+        "Cache-Control": "no-cache",
+        "Ocp-Apim-Subscription-Key": os.environ["GPT_API_KEY"],
+    }
+    data = {
+        "messages": [
+            {"role": "system", "content": ""},
+            {"role": "user", "content": prompt},
+        ],
+        "stop": ["\\n"],
+    }
+    if stream:
+        data["stream"] = True
+    if response_format and json_mode_supported:
+        data["response_format"] = response_format
+
+    return url, hdr, data
+
+
+def is_json_mode_rejected(error, response_format) -> bool:
+    """Requête en JSON mode refusée par le déploiement (400) : désactiver le JSON mode pour la suite"""
+    global json_mode_supported
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if response_format and json_mode_supported and status == 400:
+        print("-- JSON mode refusé par le déploiement, requêtes suivantes sans response_format")
+        json_mode_supported = False
+        return True
+    return False
+
+
+def parse_sse_line(line):
+    """
+    Texte apporté par une ligne d'un flux server-sent events de l'API (chat completions avec stream=true)
+
+    Returns: le fragment de texte, "" pour les lignes sans texte (commentaires, lignes vides, résultats des
+    filtres de contenu, fin du flux)
+
+    """
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if not data or data == "[DONE]":
+        return ""
+    choices = json.loads(data).get("choices") or []
+    if not choices:
+        return ""
+
+    return (choices[0].get("delta") or {}).get("content") or ""
+
 
-def call_openai(prompt):
+def call_openai(prompt, response_format=None):
     try:
-        url = os.environ["OPENAI_API_URL"]
+        url, hdr, data = build_openai_request(prompt, response_format=response_format)
+        response = get_transport().post_sync(url, hdr, data)
+        return response["choices"][0]["message"]["content"]
+    except Exception as e:
+        print(e)
+        if is_json_mode_rejected(e, response_format):
+            return call_openai(prompt)
+        return ERROR_MESSAGE
+
+
+async def acall_openai(prompt, response_format=None):
+    """Version asynchrone de call_openai, sur le pool de connexions partagé"""
+    try:
+        url, hdr, data = build_openai_request(prompt, response_format=response_format)
+        response = await get_transport().post(url, hdr, data)
+        return response["choices"][0]["message"]["content"]
+    except Exception as e:
+        print(e)
+        if is_json_mode_rejected(e, response_format):
+            return await acall_openai(prompt)
+        return ERROR_MESSAGE
 
-        hdr = {
-            # Request headers
-            "Content-Type": "application/json",
-            "Cache-Control": "no-cache",
-            "Ocp-Apim-Subscription-Key": os.environ["GPT_API_KEY"],
-        }
-        data = {
-            "messages": [
-                {"role": "system", "content": ""},
-                {"role": "user", "content": prompt},
-            ],
-            "stop": ["\\n"],
-        }
 
-        # Request body
-        data = json.dumps(data)
-        req = urllib.request.Request(url, headers=hdr, data=bytes(data.encode("utf-8")))
+def stream_openai(prompt, response_format=None, timeout=None):
+    """
+    Fragments de la réponse au fil de leur génération (message d'erreur si rien n'a pu être reçu)
 
-        req.get_method = lambda: "POST"
-        response = urllib.request.urlopen(req)
-        # print(response.status == 200)
-        return json.loads(response.read())["choices"][0]["message"]["content"]
+    Une erreur survenue après les premiers fragments est relancée : la réponse est incomplète, elle ne doit être
+    ni utilisée telle quelle ni mise en cache. timeout : délai maximal sans nouveau fragment (cf.
+    AsyncTransport.stream_lines_sync).
+    """
+    received = False
+    try:
+        url, hdr, data = build_openai_request(prompt, stream=True, response_format=response_format)
+        for line in get_transport().stream_lines_sync(url, hdr, data, timeout=timeout):
+            text = parse_sse_line(line)
+            if text:
+                received = True
+                yield text
     except Exception as e:
         print(e)
-        return "Désolé, une erreur a été rencontrée, je ne peux pas répondre à votre question."
+        if not received and is_json_mode_rejected(e, response_format):
+            yield from stream_openai(prompt, timeout=timeout)
+        elif not received:
+            yield ERROR_MESSAGE
+        else:
+            raise
+
+
+async def astream_openai(prompt, response_format=None):
+    """Version asynchrone de stream_openai"""
+    received = False
+    try:
+        url, hdr, data = build_openai_request(prompt, stream=True, response_format=response_format)
+        async for line in get_transport().stream_lines(url, hdr, data):
+            text = parse_sse_line(line)
+            if text:
+                received = True
+                yield text
+    except Exception as e:
+        print(e)
+        if not received and is_json_mode_rejected(e, response_format):
+            async for text in astream_openai(prompt):
+                yield text
+        elif not received:
+            yield ERROR_MESSAGE
+        else:
+            raise
 
 
 class CustomGPT(LLM):
@@ -78,7 +180,7 @@ class CustomGPT(LLM):
         if stop is not None:
             raise ValueError("stop kwargs are not permitted.")
 
-        return call_openai(prompt)
+        return call_openai(prompt, kwargs.get("response_format"))
 
     def _stream(
         self,
@@ -106,13 +208,60 @@ class CustomGPT(LLM):
         Returns:
             An iterator of GenerationChunks.
         """
-        for char in call_openai(prompt):
-            chunk = GenerationChunk(text=char)
+        for text in stream_openai(prompt, kwargs.get("response_format"), kwargs.get("timeout")):
+            chunk = GenerationChunk(text=text)
             if run_manager:
                 run_manager.on_llm_new_token(chunk.text, chunk=chunk)
 
             yield chunk
 
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Run the LLM on the given input, without blocking the event loop.
+
+        Concurrent calls (ainvoke / abatch) share the keep-alive connections of the transport pool.
+        """
+        if stop is not None:
+            raise ValueError("stop kwargs are not permitted.")
+
+        return await acall_openai(prompt, kwargs.get("response_format"))
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Run the LLM on the given prompts concurrently (the default implementation awaits them one by one).
+
+        abatch sends all its inputs here: the calls are limited by the connections of the transport pool.
+        """
+        texts = await asyncio.gather(
+            *[self._acall(prompt, stop=stop, run_manager=run_manager, **kwargs) for prompt in prompts]
+        )
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Stream the LLM on the given prompt, without blocking the event loop."""
+        async for text in astream_openai(prompt, kwargs.get("response_format")):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+
+            yield chunk
+
     @property
     def _identifying_params(self) -> Dict[str, Any]:
         """Return a dictionary of identifying parameters."""
@@ -0,0 +1,167 @@
+import asyncio
+import queue
+import threading
+from functools import lru_cache
+
+import httpx
+
+from utils.config import load_config
+
+DEFAULT_GPT_HTTP_CONFIG = {
+    "MAX_CONNECTIONS": 20,
+    "MAX_KEEPALIVE_CONNECTIONS": 10,
+    "KEEPALIVE_EXPIRY": 30,
+    "CONNECT_TIMEOUT": 10,
+    "READ_TIMEOUT": 120,
+}
+
+
+def get_gpt_http_config() -> dict:
+    return {**DEFAULT_GPT_HTTP_CONFIG, **load_config().get("GPT_HTTP", {})}
+
+
+class AsyncTransport:
+    """
+    Transport HTTP asynchrone avec un pool de connexions keep-alive (httpx), partagé par tout le process.
+
+    Le client httpx est lié à une boucle d'évènements dédiée, qui tourne dans un thread de fond : les appels
+    faits depuis n'importe quelle boucle (une par exécution du script Streamlit) ou depuis du code synchrone y
+    sont transmis, et réutilisent donc les mêmes connexions quelle que soit la session.
+    """
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10, keepalive_expiry=30,
+                 connect_timeout=10, read_timeout=120):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=read_timeout)
+        self.loop = None
+        self.client = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            self.client = asyncio.run_coroutine_threadsafe(self.create_client(), loop).result()
+            self.loop = loop
+
+    def run(self, coroutine):
+        """
+        Exécuter une coroutine sur la boucle du transport depuis du code synchrone (bloque jusqu'au résultat)
+
+        À utiliser à la place d'asyncio.run : les clients asynchrones gardés d'un appel à l'autre (httpx, client
+        OpenAI du modèle vLLM) restent liés à une seule boucle, qui n'est jamais fermée.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def create_client(self):
+        return httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+
+    async def send(self, url, headers, payload) -> dict:
+        response = await self.client.post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def post(self, url, headers, payload) -> dict:
+        """Requête POST JSON depuis une coroutine, exécutée sur la boucle du transport"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.send(url, headers, payload), self.loop)
+        return await asyncio.wrap_future(future)
+
+    def post_sync(self, url, headers, payload) -> dict:
+        """Requête POST JSON depuis du code synchrone (bloque jusqu'à la réponse)"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.send(url, headers, payload), self.loop).result()
+
+    async def pump_lines(self, url, headers, payload, emit, cancelled, timeout=None):
+        """
+        Lire une réponse en flux ligne par ligne et transmettre chaque ligne à emit
+
+        emit reçoit ("line", ligne), puis ("error", exception) en cas d'échec, et toujours ("end", None) à la fin.
+        La lecture s'arrête dès que cancelled est positionné (le consommateur a abandonné le flux). timeout
+        remplace les délais du client pour cette requête (connexion, attente de chaque fragment).
+        """
+        kwargs = {"timeout": timeout} if timeout else {}
+        try:
+            async with self.client.stream("POST", url, headers=headers, json=payload, **kwargs) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if cancelled.is_set():
+                        break
+                    emit(("line", line))
+        except Exception as e:
+            emit(("error", e))
+        finally:
+            emit(("end", None))
+
+    def stream_lines_sync(self, url, headers, payload, timeout=None):
+        """
+        Lignes d'une réponse en flux (server-sent events), depuis du code synchrone, au fil de leur arrivée
+
+        Avec timeout, une requête sans nouvelle ligne pendant timeout secondes (y compris avant la première) lève
+        TimeoutError.
+        """
+        self.start()
+        lines = queue.Queue()
+        cancelled = threading.Event()
+        asyncio.run_coroutine_threadsafe(
+            self.pump_lines(url, headers, payload, lines.put, cancelled, timeout), self.loop
+        )
+        try:
+            while True:
+                try:
+                    kind, value = lines.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Aucune réponse depuis {timeout} s")
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            cancelled.set()
+
+    async def stream_lines(self, url, headers, payload):
+        """Lignes d'une réponse en flux (server-sent events), depuis une coroutine, au fil de leur arrivée"""
+        self.start()
+        caller_loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def emit(item):
+            try:
+                caller_loop.call_soon_threadsafe(lines.put_nowait, item)
+            except RuntimeError:
+                # Boucle de l'appelant déjà fermée : plus personne ne lit le flux
+                cancelled.set()
+
+        asyncio.run_coroutine_threadsafe(self.pump_lines(url, headers, payload, emit, cancelled), self.loop)
+        try:
+            while True:
+                kind, value = await lines.get()
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            cancelled.set()
+
+
+@lru_cache
+def get_transport() -> AsyncTransport:
+    """Transport partagé, configuré par GPT_HTTP dans config.yml"""
+    config = get_gpt_http_config()
+    return AsyncTransport(
+        max_connections=config["MAX_CONNECTIONS"],
+        max_keepalive_connections=config["MAX_KEEPALIVE_CONNECTIONS"],
+        keepalive_expiry=config["KEEPALIVE_EXPIRY"],
+        connect_timeout=config["CONNECT_TIMEOUT"],
+        read_timeout=config["READ_TIMEOUT"],
+    )
@@ -0,0 +1,177 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class SqliteCache:
+    """
+    Cache clé/valeur persistant sur disque (SQLite), partagé entre les sessions et les process.
+
+    - TTL : une entrée plus vieille que ttl secondes n'est plus fraîche ;
+    - stale-while-revalidate : pendant stale_ttl secondes supplémentaires, l'entrée périmée est servie
+      immédiatement et rafraîchie en tâche de fond ;
+    - éviction LRU : au-delà de max_size octets, les entrées les moins récemment lues sont supprimées ;
+    - compteurs hits / stale_hits / misses pour suivre l'efficacité du cache.
+
+    Les valeurs doivent être sérialisables en JSON. Avec compress=True, elles sont stockées compressées (zlib).
+    """
+
+    def __init__(
+        self, path, table="cache", ttl=86400, stale_ttl=0, max_size=100 * 1024 * 1024, compress=False
+    ):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.compress = compress
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.refreshing = set()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB, size INTEGER, "
+                f"created REAL, accessed REAL)"
+            )
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+
+    def encode(self, value) -> bytes:
+        blob = json.dumps(value).encode("utf-8")
+        return zlib.compress(blob) if self.compress else blob
+
+    def decode(self, blob: bytes):
+        return json.loads(zlib.decompress(blob) if self.compress else blob)
+
+    def get(self, key):
+        """
+        Lire une entrée du cache
+
+        Args:
+            key: clé de l'entrée
+
+        Returns: tuple (valeur, fraîche) ou None si absente ou trop vieille pour être servie
+
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            age = now - created
+            if age > self.ttl + self.stale_ttl:
+                self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self.conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+
+        return self.decode(value), age <= self.ttl
+
+    def set(self, key, value):
+        """Écrire une entrée puis évincer les entrées les moins récemment lues si le cache est trop gros"""
+        blob = self.encode(value)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created, accessed) "
+                f"VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self.evict()
+
+    def evict(self):
+        total = self.conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_size:
+            return
+        to_delete = []
+        for key, size in self.conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed"):
+            if total <= self.max_size:
+                break
+            to_delete.append((key,))
+            total -= size
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", to_delete)
+
+    def delete(self, key):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def refresh(self, key, fetch, should_cache):
+        """Rafraîchir une entrée en tâche de fond (une seule fois à la fois par clé)"""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                value = fetch()
+                if should_cache(value):
+                    self.set(key, value)
+            except Exception as e:
+                print(f"-- Echec du rafraîchissement du cache pour {key} : {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def record(self, counter, amount=1):
+        """Compter un accès : "hits", "stale_hits" ou "misses" (cf. stats), ou incrémenter un autre compteur"""
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_or_fetch(self, key, fetch, should_cache=lambda value: True):
+        """
+        Servir une entrée depuis le cache, sinon la récupérer avec fetch et la mettre en cache
+
+        Args:
+            key: clé de l'entrée
+            fetch: fonction sans argument qui récupère la valeur
+            should_cache: fonction qui indique si une valeur récupérée peut être mise en cache
+
+        Returns: la valeur
+
+        """
+        cached = self.get(key)
+        if cached is not None:
+            value, fresh = cached
+            if fresh:
+                self.record("hits")
+            else:
+                self.record("stale_hits")
+                self.refresh(key, fetch, should_cache)
+            return value
+
+        self.record("misses")
+        value = fetch()
+        if should_cache(value):
+            self.set(key, value)
+
+        return value
+
+    def stats(self) -> dict:
+        """Compteurs de hits / misses et taille du cache"""
+        with self.lock:
+            n_entries, size = self.conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / total if total else 0.0,
+            "entries": n_entries,
+            "size": size,
+        }
@@ -0,0 +1,119 @@
+import re
+
+import numpy as np
+from scipy.sparse import diags
+
+from utils.config import load_config
+from utils.seo_analytics import term_document_matrix, tfidf
+
+DEFAULT_COMPRESSION_CONFIG = {"ENABLED": True, "TOKEN_BUDGET": 8000, "PASSAGE_WORDS": 120}
+
+block_regex = re.compile(r"\n\s*\n|(?=\bH[1-6]: )")
+sentence_regex = re.compile(r"(?<=[.!?])\s+")
+
+
+def get_compression_config() -> dict:
+    return {**DEFAULT_COMPRESSION_CONFIG, **load_config().get("COMPRESSION", {})}
+
+
+def split_passages(text, max_words=120) -> list:
+    """
+    Découper un contenu en passages d'au plus max_words mots environ
+
+    Les paragraphes (et les sections "Hn: ") sont regroupés tant que le passage ne dépasse pas max_words mots ;
+    un paragraphe trop long est découpé en phrases. Un titre court reste ainsi attaché au texte qui le suit.
+
+    """
+    passages = []
+    current = []
+    n_words = 0
+    for block in block_regex.split(text or ""):
+        block = block.strip()
+        if not block:
+            continue
+        pieces = sentence_regex.split(block) if len(block.split()) > max_words else [block]
+        for piece in pieces:
+            words = len(piece.split())
+            if current and n_words + words > max_words:
+                passages.append("\n".join(current))
+                current = []
+                n_words = 0
+            current.append(piece)
+            n_words += words
+    if current:
+        passages.append("\n".join(current))
+
+    return passages
+
+
+def score_passages(passages, query) -> np.ndarray:
+    """Similarité cosinus TF-IDF de chaque passage avec la requête (idf calculé sur l'ensemble des passages)"""
+    if not passages:
+        return np.zeros(0)
+    matrix, _ = term_document_matrix(passages + [query])
+    if not matrix.shape[1]:
+        return np.zeros(len(passages))
+    weights, _ = tfidf(matrix)
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    weights = diags(1 / np.maximum(norms, 1e-12)) @ weights
+    scores = weights[:-1] @ weights[-1].T
+
+    return np.asarray(scores.todense()).ravel()
+
+
+def compress_examples(examples, query, counter, token_budget, passage_words=120):
+    """
+    Compression extractive des contenus concurrents : garder les passages les plus proches de la requête
+
+    Args:
+        examples: contenus des concurrents, du mieux classé au moins bien classé
+        query: texte de la requête (mot clé, questions fréquentes, mots clés)
+        counter: TokenCounter du modèle
+        token_budget: nombre de tokens visé pour l'ensemble des passages gardés
+        passage_words: taille des passages en mots
+
+    Returns: tuple (contenus compressés, rapport : tokens avant / après et passages gardés par concurrent). Les
+    passages gardés sont remis dans leur ordre d'origine ; les concurrents sans passage gardé sont retirés.
+
+    """
+    passages = []
+    owners = []
+    for i, example in enumerate(examples):
+        for passage in split_passages(example, passage_words):
+            passages.append(passage)
+            owners.append(i)
+    tokens = [counter.count(p) for p in passages]
+    scores = score_passages(passages, query)
+
+    kept = set()
+    used = 0
+    # Tri stable : à score égal, l'ordre d'origine (classement des concurrents) est conservé
+    for p in np.argsort(-scores, kind="stable"):
+        if used + tokens[p] <= token_budget:
+            kept.add(p)
+            used += tokens[p]
+
+    compressed = []
+    details = []
+    for i, example in enumerate(examples):
+        example_passages = [p for p in range(len(passages)) if owners[p] == i]
+        kept_passages = [p for p in example_passages if p in kept]
+        details.append(
+            {
+                "index": i,
+                "tokens": counter.count(example),
+                "kept_tokens": sum(tokens[p] for p in kept_passages),
+                "passages": len(example_passages),
+                "kept_passages": len(kept_passages),
+            }
+        )
+        if kept_passages:
+            compressed.append("\n\n".join(passages[p] for p in kept_passages))
+
+    report = {
+        "tokens": sum(d["tokens"] for d in details),
+        "kept_tokens": used,
+        "examples": details,
+    }
+
+    return compressed, report
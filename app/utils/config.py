@@ -0,0 +1,22 @@
+import os
+from functools import lru_cache
+
+import yaml
+from yaml.loader import SafeLoader
+
+# Get the directory of the current script
+dir_path = os.path.dirname(os.path.realpath(__file__))
+config_path = os.path.join(dir_path, "..", "..", "config.yml")
+
+
+@lru_cache
+def load_config() -> dict:
+    """
+    Charger la configuration de l'application (config.yml à la racine du projet)
+
+    Returns: dictionnaire de configuration
+
+    """
+    path = config_path if os.path.exists(config_path) else "config.yml"
+    with open(path) as f:
+        return yaml.load(f, Loader=SafeLoader)
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def run_dag(nodes, max_workers=None):
+    """
+    Exécuter un graphe de tâches en parallèle : chaque tâche est lancée dès que ses dépendances sont terminées
+
+    Args:
+        nodes: dictionnaire nom => (fonction, liste des noms des dépendances). La fonction reçoit les
+            résultats de ses dépendances en arguments positionnels, dans l'ordre de la liste.
+        max_workers: nombre maximal de tâches simultanées (par défaut, le nombre de tâches)
+
+    Returns: tuple (résultats, durées) : dictionnaires nom => résultat et nom => durée en secondes
+
+    """
+    for name, (_, deps) in nodes.items():
+        unknown = [d for d in deps if d not in nodes]
+        if unknown:
+            raise ValueError(f"Dépendances inconnues pour {name} : {unknown}")
+
+    results = {}
+    timings = {}
+
+    def run_node(name):
+        fn, deps = nodes[name]
+        start = time.time()
+        res = fn(*[results[d] for d in deps])
+        timings[name] = time.time() - start
+        return res
+
+    pending = dict(nodes)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(nodes), 1)) as executor:
+        while pending or running:
+            ready = [n for n, (_, deps) in pending.items() if all(d in results for d in deps)]
+            for name in ready:
+                running[executor.submit(run_node, name)] = name
+                del pending[name]
+            if not running:
+                raise ValueError(f"Dépendances circulaires entre : {list(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    for f in running:
+                        f.cancel()
+                    raise
+
+    return results, timings
@@ -0,0 +1,102 @@
+import zlib
+
+import numpy as np
+
+from utils.config import load_config
+from utils.textformatools import parse_hn_from_dict, tokenize
+
+DEFAULT_DEDUP_CONFIG = {
+    "NUM_PERM": 128,
+    "SHINGLE_SIZE": 5,
+    "CONTENT_THRESHOLD": 0.8,
+    "HN_THRESHOLD": 0.9,
+    "MIN_HEADINGS": 3,
+}
+# Nombre premier de Mersenne 2^31 - 1 : les produits a * x restent dans un entier 64 bits
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def get_dedup_config() -> dict:
+    return {**DEFAULT_DEDUP_CONFIG, **load_config().get("DEDUP", {})}
+
+
+def shingles(text, k=5) -> set:
+    """Ensemble des k-grammes de mots du texte normalisé (mots vides compris), hachés sur 32 bits"""
+    tokens = tokenize(text or "", remove_stopwords=False)
+    if len(tokens) < k:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))} if tokens else set()
+    return {zlib.crc32(" ".join(tokens[i:i + k]).encode("utf-8")) for i in range(len(tokens) - k + 1)}
+
+
+class MinHasher:
+    """Signatures MinHash de num_perm permutations (a * x + b mod p), identiques pour une même graine"""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, hashed_shingles):
+        """Signature d'un ensemble de shingles, ou None s'il est vide"""
+        if not hashed_shingles:
+            return None
+        x = np.fromiter(hashed_shingles, dtype=np.uint64) % MERSENNE_PRIME
+        permuted = (np.outer(x, self.a) + self.b) % MERSENNE_PRIME
+
+        return permuted.min(axis=0)
+
+
+def similarity(sig1, sig2) -> float:
+    """Estimation de la similarité de Jaccard à partir de deux signatures MinHash (0 si l'une est vide)"""
+    if sig1 is None or sig2 is None:
+        return 0.0
+    return float(np.mean(sig1 == sig2))
+
+
+def find_near_duplicates(concurrents_data, config=None):
+    """
+    Repérer les pages quasi identiques parmi les concurrents (contenu ou structure Hn)
+
+    Les concurrents sont parcourus dans l'ordre : chacun est comparé aux concurrents déjà gardés, et il est
+    écarté si son contenu ou sa structure Hn est trop proche de l'un d'eux. Les pages sans contenu ne sont
+    jamais considérées comme doublons sur leur contenu.
+
+    Args:
+        concurrents_data: concurrents classés (content, headings, url)
+        config: seuils (cf. DEDUP dans config.yml)
+
+    Returns: tuple (concurrents gardés, décisions pour les concurrents écartés : url, url gardée,
+    similarités estimées du contenu et de la structure Hn)
+
+    """
+    config = config or get_dedup_config()
+    hasher = MinHasher(config["NUM_PERM"])
+    kept = []
+    duplicates = []
+    for concurrent in concurrents_data:
+        headings = [text for _, text in parse_hn_from_dict(concurrent["headings"] or {})]
+        content_sig = hasher.signature(shingles(concurrent["content"], config["SHINGLE_SIZE"]))
+        hn_sig = None
+        if len(headings) >= config["MIN_HEADINGS"]:
+            hn_sig = hasher.signature(shingles(" \n ".join(headings), 3))
+
+        duplicate = None
+        for other, other_content_sig, other_hn_sig in kept:
+            content_sim = similarity(content_sig, other_content_sig)
+            hn_sim = similarity(hn_sig, other_hn_sig)
+            if content_sim >= config["CONTENT_THRESHOLD"] or hn_sim >= config["HN_THRESHOLD"]:
+                duplicate = {
+                    "url": concurrent["url"],
+                    "position": concurrent["position"],
+                    "duplicate_of": other["url"],
+                    "content_similarity": round(content_sim, 3),
+                    "hn_similarity": round(hn_sim, 3),
+                }
+                break
+
+        if duplicate:
+            duplicates.append(duplicate)
+        else:
+            kept.append((concurrent, content_sig, hn_sig))
+
+    return [c for c, _, _ in kept], duplicates
@@ -0,0 +1,96 @@
+import re
+
+from bs4 import BeautifulSoup, Comment, SoupStrainer
+
+from utils.config import load_config
+
+try:
+    import lxml  # noqa: F401
+
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Blocs sans contenu éditorial, retirés de l'arbre après le parsing
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "svg", "template", "iframe"]
+# Blocs retirés du HTML brut avant le parsing : commentaires, et scripts et styles, dont le contenu s'arrête à la
+# première balise fermante pour le parser aussi (une balise <script/> ou non fermée ne change pas cette règle)
+RAW_BLOCK_PATTERN = r"<!--|<(script|style)(?=[\s/>])"
+RAW_BLOCK_END_PATTERNS = {"": r"-->", "script": r"</script[^>]*>", "style": r"</style[^>]*>"}
+raw_block_regex = re.compile(RAW_BLOCK_PATTERN, re.IGNORECASE)
+raw_block_regex_bytes = re.compile(RAW_BLOCK_PATTERN.encode(), re.IGNORECASE)
+raw_block_end_regex = {k: re.compile(v, re.IGNORECASE) for k, v in RAW_BLOCK_END_PATTERNS.items()}
+raw_block_end_regex_bytes = {
+    k.encode(): re.compile(v.encode(), re.IGNORECASE) for k, v in RAW_BLOCK_END_PATTERNS.items()
+}
+
+
+def get_parser(parser=None) -> str:
+    """
+    Choisir le parser HTML : celui demandé, sinon HTML_PARSER de config.yml (lxml par défaut).
+    Repli sur html.parser si lxml n'est pas installé.
+    """
+    parser = parser or load_config().get("HTML_PARSER", "lxml")
+    if parser == "lxml" and not LXML_AVAILABLE:
+        return "html.parser"
+    return parser
+
+
+def strip_raw_blocks(markup):
+    """
+    Retirer commentaires, scripts et styles du HTML brut (str ou bytes), en un seul parcours
+
+    Un bloc sans fin (commentaire ou balise fermante absente) arrête le parcours : la suite est laissée au parser.
+    """
+    is_bytes = isinstance(markup, bytes)
+    regex, end_regex = (raw_block_regex_bytes, raw_block_end_regex_bytes) if is_bytes else (
+        raw_block_regex, raw_block_end_regex
+    )
+    parts = []
+    pos = 0
+    while True:
+        match = regex.search(markup, pos)
+        if match is None:
+            break
+        end = end_regex[(match.group(1) or markup[:0]).lower()].search(markup, match.end())
+        if end is None:
+            break
+        parts.append(markup[pos:match.start()])
+        pos = end.end()
+    parts.append(markup[pos:])
+
+    return markup[:0].join(parts)
+
+
+def strip_boilerplate(soup):
+    """Retirer de l'arbre les blocs sans contenu éditorial (cf. BOILERPLATE_TAGS) et les commentaires"""
+    for tag in soup.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+
+    return soup
+
+
+def make_soup(markup, tags=None, strip=True, parser=None) -> BeautifulSoup:
+    """
+    Parser une page HTML en ne gardant que ce qui est utile
+
+    Args:
+        markup: HTML brut (str ou bytes)
+        tags: si donné, seules ces balises (et leur contenu) sont gardées dans l'arbre
+        strip: retirer le boilerplate (scripts, styles, navigation, commentaires)
+        parser: parser à utiliser (cf. get_parser)
+
+    Returns: l'arbre BeautifulSoup
+
+    """
+    parse_only = None
+    if strip:
+        markup = strip_raw_blocks(markup)
+    if tags:
+        # Les blocs de boilerplate passent le filtre pour que les balises qu'ils contiennent soient retirées avec eux
+        parse_only = SoupStrainer(list(tags) + (BOILERPLATE_TAGS if strip else []))
+    soup = BeautifulSoup(markup, get_parser(parser), parse_only=parse_only)
+
+    return strip_boilerplate(soup) if strip else soup
@@ -0,0 +1,234 @@
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from utils.config import load_config
+from utils.ratelimit import RateLimited, get_limiter
+
+DEFAULT_HTTP_CONFIG = {
+    "POOL_CONNECTIONS": 10,
+    "POOL_MAXSIZE": 20,
+    "CONNECT_TIMEOUT": 5,
+    "READ_TIMEOUT": 20,
+    "RETRIES": 2,
+    "BACKOFF_FACTOR": 0.5,
+    # 429 est géré par le limiteur (cf. request) : un retry urllib3 attendrait en gardant le créneau de l'hôte
+    "RETRY_STATUS": [500, 502, 503, 504],
+}
+
+DEFAULT_DOWNLOAD_CONFIG = {
+    "MAX_BYTES": 3000000,
+    "ALLOWED_CONTENT_TYPES": ["text/html", "application/xhtml+xml"],
+    "CONNECT_TIMEOUT": 5,
+    "READ_TIMEOUT": 10,
+    "MAX_DURATION": 20,
+}
+
+session_lock = threading.Lock()
+shared_session = None
+
+
+def get_http_config() -> dict:
+    """Paramètres du client HTTP : valeurs par défaut surchargées par HTTP_CLIENT de config.yml"""
+    return {**DEFAULT_HTTP_CONFIG, **(load_config().get("HTTP_CLIENT") or {})}
+
+
+def get_download_config() -> dict:
+    """Limites des téléchargements de pages : valeurs par défaut surchargées par DOWNLOAD de config.yml"""
+    return {**DEFAULT_DOWNLOAD_CONFIG, **(load_config().get("DOWNLOAD") or {})}
+
+
+class DownloadSkipped(Exception):
+    """
+    Téléchargement abandonné avant la fin
+
+    Args:
+        reason: code court (http_error, content_type, too_large, timeout, connection_error)
+        detail: précision lisible (statut, type de contenu, taille...)
+    """
+
+    def __init__(self, reason, detail=""):
+        super().__init__(f"{reason} : {detail}")
+        self.reason = reason
+        self.detail = detail
+
+    def to_dict(self) -> dict:
+        return {"reason": self.reason, "detail": self.detail}
+
+
+def build_session(http_config=None) -> requests.Session:
+    """
+    Créer une session HTTP avec un pool de connexions keep-alive par hôte et des retries
+
+    Args:
+        http_config: paramètres du client (cf. DEFAULT_HTTP_CONFIG), config.yml par défaut
+
+    Returns: session requests
+
+    """
+    http_config = http_config or get_http_config()
+    retry = Retry(
+        total=http_config["RETRIES"],
+        backoff_factor=http_config["BACKOFF_FACTOR"],
+        status_forcelist=http_config["RETRY_STATUS"],
+        allowed_methods=None,  # SEMrank est interrogé en POST : retry sur toutes les méthodes
+        raise_on_status=False,
+    )
+    # pool_connections : nombre d'hôtes gardés en cache, pool_maxsize : connexions par hôte
+    adapter = HTTPAdapter(
+        pool_connections=http_config["POOL_CONNECTIONS"],
+        pool_maxsize=http_config["POOL_MAXSIZE"],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def get_session() -> requests.Session:
+    """Session partagée par tout le process (et donc par toutes les sessions Streamlit)"""
+    global shared_session
+    if shared_session is None:
+        with session_lock:
+            if shared_session is None:
+                shared_session = build_session()
+    return shared_session
+
+
+def host_slot(url):
+    """Créneau du limiteur partagé pour l'hôte de l'url (cf. utils.ratelimit)"""
+    return get_limiter().slot(urlparse(url).hostname or "")
+
+
+def pause_host(url, response):
+    """L'hôte nous freine (429) : suspendre ses requêtes dans le limiteur le temps demandé par Retry-After"""
+    retry_after = response.headers.get("Retry-After", "")
+    get_limiter().bucket(urlparse(url).hostname or "").pause(int(retry_after) if retry_after.isdigit() else 5)
+
+
+def request(method, url, limit=True, **kwargs) -> requests.Response:
+    """
+    Envoyer une requête via la session partagée, avec le timeout par défaut de la config si aucun n'est donné
+
+    Après une réponse 429, l'hôte est suspendu dans le limiteur et la requête est renvoyée une fois, avec un
+    nouveau créneau (donc après la pause). Si l'appelant détient déjà le créneau (limit=False), la réponse 429
+    lui est retournée et c'est à lui de relancer après l'avoir libéré.
+
+    Args:
+        method: méthode HTTP (GET, POST, ...)
+        url: url à requêter
+        limit: attendre un créneau du limiteur par hôte (False si l'appelant le détient déjà)
+        **kwargs: arguments passés à requests.Session.request
+
+    Returns: réponse HTTP
+
+    Raises: RateLimited si aucun créneau n'est obtenu à temps
+
+    """
+    if kwargs.get("timeout") is None:
+        http_config = get_http_config()
+        kwargs["timeout"] = (http_config["CONNECT_TIMEOUT"], http_config["READ_TIMEOUT"])
+    for attempt in range(2):
+        with host_slot(url) if limit else nullcontext():
+            response = get_session().request(method, url, **kwargs)
+        if response.status_code != 429:
+            break
+        pause_host(url, response)
+        if not limit or attempt:
+            break
+        response.close()
+
+    return response
+
+
+def get(url, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def stream_download(url, max_bytes=None, allowed_types=None, timeout=None, max_duration=None, headers=None):
+    """
+    Télécharger une page en streaming, en s'arrêtant dès qu'une limite est dépassée
+
+    Args:
+        url: url de la page
+        max_bytes: taille maximale du contenu (décompressé)
+        allowed_types: types de contenu acceptés (les PDF et binaires sont ignorés par défaut)
+        timeout: timeout de connexion/lecture, en secondes ou tuple (connexion, lecture)
+        max_duration: durée maximale du téléchargement complet, en secondes
+        headers: en-têtes supplémentaires (If-None-Match, If-Modified-Since...)
+
+    Returns: tuple (statut HTTP, en-têtes de la réponse, contenu brut). Le contenu est vide pour un 304.
+
+    Raises: DownloadSkipped si la page est ignorée ou si le téléchargement est interrompu
+
+    """
+    download_config = get_download_config()
+    max_bytes = max_bytes or download_config["MAX_BYTES"]
+    allowed_types = allowed_types or download_config["ALLOWED_CONTENT_TYPES"]
+    timeout = timeout or (download_config["CONNECT_TIMEOUT"], download_config["READ_TIMEOUT"])
+    max_duration = max_duration or download_config["MAX_DURATION"]
+    # Le timeout de lecture s'applique à chaque lecture sur la socket : borné par max_duration, il coupe aussi un
+    # serveur qui ne répond plus, entre deux chunks, là où la vérification de la durée n'est jamais atteinte
+    connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    timeout = (min(connect_timeout, max_duration), min(read_timeout, max_duration))
+
+    try:
+        for attempt in range(2):
+            # Le créneau est gardé pendant tout le téléchargement du contenu
+            with host_slot(url):
+                start = time.time()
+                with request("GET", url, limit=False, stream=True, timeout=timeout, headers=headers) as response:
+                    if response.status_code == 429 and not attempt:
+                        # Hôte suspendu par request : nouvelle tentative avec un nouveau créneau, après la pause
+                        continue
+                    if response.status_code == 304:
+                        return response.status_code, response.headers, b""
+                    if response.status_code >= 400:
+                        raise DownloadSkipped("http_error", str(response.status_code))
+
+                    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if content_type and content_type not in allowed_types:
+                        raise DownloadSkipped("content_type", content_type)
+
+                    content_length = response.headers.get("Content-Length", "")
+                    if content_length.isdigit() and int(content_length) > max_bytes:
+                        raise DownloadSkipped("too_large", f"{content_length} octets annoncés")
+
+                    chunks = []
+                    size = 0
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise DownloadSkipped("too_large", f"plus de {max_bytes} octets")
+                        if time.time() - start > max_duration:
+                            raise DownloadSkipped("timeout", f"plus de {max_duration}s")
+                        chunks.append(chunk)
+            break
+    except RateLimited as e:
+        raise DownloadSkipped("rate_limited", str(e))
+    except requests.Timeout as e:
+        raise DownloadSkipped("timeout", str(e))
+    except requests.ConnectionError as e:
+        # Un timeout de lecture pendant iter_content est remonté par requests comme une erreur de connexion
+        if e.args and isinstance(e.args[0], ReadTimeoutError):
+            raise DownloadSkipped("timeout", str(e))
+        raise DownloadSkipped("connection_error", str(e))
+
+    return response.status_code, response.headers, b"".join(chunks)
+
+
+def download(url, max_bytes=None, allowed_types=None, timeout=None, max_duration=None) -> bytes:
+    """Télécharger une page en streaming (cf. stream_download) et retourner son contenu brut"""
+    return stream_download(url, max_bytes, allowed_types, timeout, max_duration)[2]
@@ -0,0 +1,148 @@
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+from utils.textformatools import normalize_text
+
+
+def is_word_char(c) -> bool:
+    """Caractère de mot au sens de \\w des expressions régulières"""
+    return c.isalnum() or c == "_"
+
+
+def normalize_with_offsets(text):
+    """
+    Normaliser un texte (cf. normalize_text) en gardant la correspondance des positions
+
+    Returns: tuple (texte normalisé, liste donnant pour chaque caractère normalisé sa position dans le texte)
+
+    """
+    chars = []
+    offsets = []
+    for i, c in enumerate(text):
+        if c.isascii():
+            chars.append(c.lower())
+            offsets.append(i)
+            continue
+        for n in unicodedata.normalize("NFKD", c.lower()):
+            if not unicodedata.combining(n):
+                chars.append(n)
+                offsets.append(i)
+
+    return "".join(chars), offsets
+
+
+class KeywordMatcher:
+    """
+    Automate d'Aho-Corasick construit une fois pour une liste de mots clés : toutes les occurrences de tous
+    les mots clés sont trouvées en un seul parcours du texte, sans tenir compte de la casse ni des accents.
+    Comme avec \\b...\\b, seules les occurrences délimitées par des frontières de mots sont comptées.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.patterns = []  # Mots clés normalisés, sans doublon
+        self.keyword_patterns = []  # Pour chaque mot clé, l'indice de son motif
+        index = {}
+        for keyword in self.keywords:
+            pattern = normalize_text(keyword)
+            if pattern not in index:
+                index[pattern] = len(self.patterns)
+                self.patterns.append(pattern)
+            self.keyword_patterns.append(index[pattern])
+
+        # Trie : transitions, lien d'échec et motifs reconnus pour chaque état
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for p, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for c in pattern:
+                if c not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][c] = len(self.goto) - 1
+                state = self.goto[state][c]
+            self.output[state].append(p)
+
+        # Liens d'échec en largeur d'abord
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and c not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(c, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text) -> list:
+        """
+        Trouver toutes les occurrences des motifs dans le texte
+
+        Returns: pour chaque motif, la liste des positions (début, fin) dans le texte d'origine. Comme avec
+        re.findall, les occurrences d'un même motif ne se chevauchent pas.
+
+        """
+        normalized, offsets = normalize_with_offsets(text)
+        positions = [[] for _ in self.patterns]
+        last_end = [0] * len(self.patterns)
+        n = len(normalized)
+        state = 0
+        for i, c in enumerate(normalized):
+            while state and c not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(c, 0)
+            for p in self.output[state]:
+                start = i - len(self.patterns[p]) + 1
+                # Frontières de mots équivalentes à \b au début et à la fin de l'occurrence
+                if start > 0 and is_word_char(normalized[start - 1]) == is_word_char(normalized[start]):
+                    continue
+                if i + 1 < n and is_word_char(normalized[i]) == is_word_char(normalized[i + 1]):
+                    continue
+                if start == 0 and not is_word_char(normalized[start]):
+                    continue
+                if i + 1 == n and not is_word_char(normalized[i]):
+                    continue
+                if start < last_end[p]:
+                    continue
+                last_end[p] = i + 1
+                positions[p].append((offsets[start], offsets[i] + 1))
+
+        # Un mot clé vide est trouvé dès que le texte contient un mot (comme \b\b)
+        if "" in self.patterns:
+            if any(is_word_char(c) for c in normalized):
+                positions[self.patterns.index("")] = [(0, 0)]
+
+        return positions
+
+    def analyze(self, text) -> dict:
+        """
+        Score sémantique du texte et occurrences de chaque mot clé
+
+        Returns: dictionnaire avec le score (entre 0 et 100, proportion des mots clés présents), et pour
+        chaque mot clé le nombre d'occurrences et leurs positions (début, fin) dans le texte
+
+        """
+        positions = self.find(text)
+        keyword_positions = {}
+        for keyword, p in zip(self.keywords, self.keyword_patterns):
+            keyword_positions[keyword] = positions[p]
+        n_found = sum(len(positions[p]) > 0 for p in self.keyword_patterns)
+        score = (n_found / len(self.keywords)) * 100 if self.keywords else 0
+
+        return {
+            "score": int(min(100, max(0, score))),
+            "counts": {k: len(v) for k, v in keyword_positions.items()},
+            "positions": keyword_positions,
+        }
+
+
+@lru_cache(maxsize=32)
+def get_keyword_matcher(keywords: tuple) -> KeywordMatcher:
+    """Automate mis en cache pour une liste de mots clés (réutilisé à chaque rafraîchissement de la page)"""
+    return KeywordMatcher(keywords)
@@ -1,12 +1,26 @@
+import asyncio
+import copy
 import json
+import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List
-from langchain.output_parsers import PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field, validator
 import yaml
 from yaml.loader import SafeLoader
 
+from model.cache import without_cache
+from model.gpt.get_model import ERROR_MESSAGE
+from model.gpt.transport import get_transport
+from utils.compression import sentence_regex
+from utils.config import load_config
+from utils.output_repair import RepairingOutputParser
+from utils.prompt_layout import layout_prompt
+from utils.rolling_context import RollingContext
+
 # Get the directory of the current script
 dir_path = os.path.dirname(os.path.realpath(__file__))
 
@@ -14,6 +28,24 @@ with open(os.path.join(dir_path, "banned_expression.yml")) as f:
     banned_expr_list = yaml.load(f, Loader=SafeLoader)
 banned_expr_list = [s.strip() for s in banned_expr_list["expressions"]]
 
+# ENGINE : sequential (section par section, 3 propositions par appel), ou versions / skeleton (moteurs parallèles, à
+# activer dans CONTENT_GENERATION de config.yml). SECTION_CONCURRENCY dépend du déploiement : ne pas dépasser le
+# nombre de requêtes traitées en parallèle par le serveur du modèle (max-num-seqs de vLLM), sinon les appels attendent
+# en file
+DEFAULT_CONTENT_GENERATION_CONFIG = {
+    "ENGINE": "sequential",
+    "CONTEXT_MODE": "rolling",
+    "SUMMARY_WORDS": 200,
+    "SENTENCE_WORDS": 30,
+    "MAX_CONCURRENCY": 3,
+    "SECTION_CONCURRENCY": 8,
+    "CALL_TIMEOUT": 300,
+}
+
+
+def get_content_generation_config() -> dict:
+    return {**DEFAULT_CONTENT_GENERATION_CONFIG, **load_config().get("CONTENT_GENERATION", {})}
+
 
 class StructureHn(BaseModel):
     structure: dict[str, list[list[str, str]]] = Field(
@@ -50,8 +82,96 @@ class Summary(BaseModel):
     )
 
 
-def build_chain(llm, output_class):
-    parser = PydanticOutputParser(pydantic_object=output_class)
+class Skeleton(BaseModel):
+    brief: list[list[str, str]] = Field(
+        description="Liste des briefs des sections de l'article, dans l'ordre de la structure Hn et sans le h1. "
+        "Chaque brief est une liste de 2 éléments : les points clés de la section et l'accroche de transition vers "
+        "la section suivante"
+    )
+
+
+class Transitions(BaseModel):
+    transitions: list[str] = Field(
+        description="Liste des phrases d'ouverture des sections, à partir de la deuxième section, dans l'ordre de "
+        "l'article. Chaque phrase est un string"
+    )
+
+
+# Nombre d'appels au LLM et de réponses inexploitables par type de génération (structure, part_content...)
+generation_stats = {}
+generation_stats_lock = threading.Lock()
+
+
+def record_generation(kind, valid):
+    """Compter un appel au LLM pour une génération, et s'il a dû être relancé (réponse inexploitable)"""
+    with generation_stats_lock:
+        stats = generation_stats.setdefault(kind, {"requests": 0, "invalid": 0})
+        stats["requests"] += 1
+        stats["invalid"] += 0 if valid else 1
+
+
+def get_generation_stats() -> dict:
+    with generation_stats_lock:
+        return copy.deepcopy(generation_stats)
+
+
+def guided_json_schema(output_class, n_proposals=3) -> dict:
+    """
+    Schéma JSON strict d'une classe de sortie, pour le décodage guidé
+
+    Le schéma pydantic est complété pour imposer exactement n_proposals propositions (les dictionnaires de
+    propositions ont des clés fixes proposition_1, proposition_2...) et des paires [niveau, titre] ou [titre,
+    méta-description] de 2 éléments.
+
+    """
+    # Copie : pydantic garde le schéma en cache, il ne doit pas être modifié d'un appel à l'autre
+    schema = copy.deepcopy(output_class.schema())
+    prop = next(iter(schema["properties"].values()))
+    if prop["type"] == "array":
+        prop.update(minItems=n_proposals, maxItems=n_proposals)
+        item = prop["items"]
+    else:
+        item = prop.pop("additionalProperties")
+        prop["properties"] = {f"proposition_{i + 1}": item for i in range(n_proposals)}
+        prop["required"] = list(prop["properties"])
+        prop["additionalProperties"] = False
+    if item.get("type") == "array":
+        pair = item["items"] if item["items"].get("type") == "array" else item
+        pair.update(minItems=2, maxItems=2)
+
+    return schema
+
+
+def guided_decoding_kwargs(llm, output_class, n_proposals=3) -> dict:
+    """
+    Paramètres d'appel qui contraignent la sortie du LLM au format JSON attendu
+
+    - vLLM (Mixtral) : guided_json avec le schéma strict de la classe de sortie ;
+    - GPT (Azure OpenAI) : JSON mode, qui garantit un JSON valide mais pas le respect du schéma.
+
+    """
+    llm_type = llm._llm_type.removeprefix("cached-")
+    if llm_type == "vllm-openai":
+        return {"extra_body": {"guided_json": guided_json_schema(output_class, n_proposals)}}
+    if llm_type == "customGPT":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+def build_chain(llm, output_class, guided=None, n_proposals=3):
+    """
+    Chaîne prompt | llm | parser pour une classe de sortie
+
+    Args:
+        llm: modèle LangChain
+        output_class: classe pydantic de la sortie attendue
+        guided: décodage guidé (cf. guided_decoding_kwargs), par défaut GUIDED_DECODING.ENABLED de config.yml
+        n_proposals: nombre de propositions imposé par le décodage guidé et gardé par la réparation de la sortie
+
+    """
+    # Une sortie presque valide (prose autour du JSON, guillemets simples, troncature...) est réparée plutôt que
+    # relancée
+    parser = RepairingOutputParser(pydantic_object=output_class, n_proposals=n_proposals)
 
     prompt = PromptTemplate(
         template="Answer the user query based on the information given.\n{format_instructions}\n{query}\n",
@@ -59,20 +179,176 @@ def build_chain(llm, output_class):
         partial_variables={"format_instructions": parser.get_format_instructions()},
     )
 
+    if guided is None:
+        guided = load_config().get("GUIDED_DECODING", {}).get("ENABLED", False)
+    kwargs = guided_decoding_kwargs(llm, output_class, n_proposals) if guided else {}
+    if kwargs:
+        llm = llm.bind(**kwargs)
+
     chain = prompt | llm | parser
 
     return chain
 
 
-def get_intention_recherche(keyword, llm):
+def generate_prompt_missing_proposals(prompt, proposals, n_missing):
+    prompt = f"""{prompt}
+    
+    ### Propositions déjà obtenues : 
+    {json.dumps(proposals, ensure_ascii=False)}
+    
+    ### Complément : 
+    Ne fournir que {n_missing} nouvelle(s) proposition(s), différente(s) des propositions déjà obtenues, en 
+    respectant les mêmes consignes et le même format de sortie.
+    """
+    return prompt
+
+
+def merge_proposals(proposals, new_proposals, n_proposals=3):
+    """Ajouter les nouvelles propositions (liste ou dictionnaire) aux propositions existantes, sans dépasser n_proposals"""
+    if isinstance(proposals, dict):
+        merged = dict(proposals)
+        for proposal in list(new_proposals.values())[: n_proposals - len(merged)]:
+            key = f"proposition_{len(merged) + 1}"
+            while key in merged:
+                key += "_bis"
+            merged[key] = proposal
+        return merged
+
+    return (list(proposals) + list(new_proposals))[:n_proposals]
+
+
+def complete_proposals(llm, output_class, prompt, proposals, kind, n_proposals=3):
+    """
+    Demander au LLM uniquement les propositions manquantes, plutôt que de relancer toute la génération
+
+    Args:
+        llm: modèle LangChain
+        output_class: classe pydantic de la sortie attendue
+        prompt: prompt de la génération initiale
+        proposals: propositions déjà obtenues (liste ou dictionnaire, selon output_class)
+        kind: type de génération, pour les compteurs (cf. record_generation)
+        n_proposals: nombre de propositions attendu
+
+    Returns: propositions complétées (éventuellement toujours incomplètes si le complément a échoué)
+
+    """
+    n_missing = n_proposals - len(proposals)
+    if not proposals or n_missing <= 0 or llm is None:
+        return proposals
+
+    field = next(iter(output_class.__fields__))
+    chain = build_chain(llm, output_class, n_proposals=n_missing)
+    try:
+        print(f"-- Start {kind} completion ({n_missing} missing)")
+        res = chain.invoke({"query": generate_prompt_missing_proposals(prompt, proposals, n_missing)})
+        new_proposals = getattr(res, field)
+        record_generation(f"{kind}_complement", len(new_proposals) >= n_missing)
+    except Exception:
+        print(f"-- Failed to complete {kind}")
+        record_generation(f"{kind}_complement", False)
+        return proposals
+
+    return merge_proposals(proposals, new_proposals, n_proposals)
+
+
+def invoke_llm(llm, prompt, on_token=None) -> str:
+    """
+    Appeler le LLM, en flux si on_token est donné
+
+    Args:
+        llm: modèle LangChain
+        prompt: prompt à envoyer
+        on_token: fonction appelée avec le texte déjà reçu à chaque nouveau fragment (affichage progressif)
+
+    Returns: la réponse complète, ou le message d'erreur si le flux a été interrompu
+
+    """
+    if on_token is None:
+        return llm.invoke(prompt)
+    text = ""
+    try:
+        for chunk in llm.stream(prompt):
+            text += chunk
+            on_token(text)
+    except Exception as e:
+        print(f"-- Flux interrompu après {len(text)} caractères : {e}")
+        on_token(ERROR_MESSAGE)
+        return ERROR_MESSAGE
+
+    return text
+
+
+def invoke_llm_batch(llm, prompts, on_tokens=None, kind="batch", max_concurrency=3, timeout=None):
+    """
+    Appeler le LLM pour plusieurs prompts indépendants en parallèle, en gardant les réponses obtenues même si
+    certains appels échouent
+
+    Args:
+        llm: modèle LangChain
+        prompts: prompts à envoyer
+        on_tokens: fonctions on_token (cf. invoke_llm), une par prompt, ou None
+        kind: type de génération, pour les compteurs (cf. record_generation)
+        max_concurrency: nombre maximal d'appels simultanés
+        timeout: délai maximal d'un appel en secondes (None : pas de limite). Il est aussi passé au client comme
+            délai de la requête, pour qu'un appel sans réponse (même avant son premier fragment) échoue au lieu
+            de bloquer son thread ; une réponse en flux est interrompue dès que le délai est dépassé.
+
+    Returns: les réponses dans l'ordre des prompts, None pour un appel en échec ou hors délai
+
+    """
+    on_tokens = on_tokens or [None] * len(prompts)
+    # Positionné quand le lot n'attend plus les appels en cours : ils s'arrêtent au fragment suivant
+    abandoned = threading.Event()
+
+    def call(prompt, on_token):
+        if timeout is None:
+            return invoke_llm(llm, prompt, on_token)
+        deadline = time.time() + timeout
+        text = ""
+        for chunk in llm.stream(prompt, timeout=timeout):
+            text += chunk
+            if on_token:
+                on_token(text)
+            if abandoned.is_set() or time.time() > deadline:
+                raise TimeoutError(f"Délai de {timeout} s dépassé")
+
+        return text
+
+    if not prompts:
+        return []
+    max_workers = max(1, min(max_concurrency, len(prompts)))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(call, p, on_token) for p, on_token in zip(prompts, on_tokens)]
+    # Filet de sécurité si un appel ne renvoie plus rien : chaque vague d'appels a droit au délai d'un appel
+    overall_timeout = None if timeout is None else timeout * math.ceil(len(prompts) / max_workers) + 5
+    wait(futures, timeout=overall_timeout)
+    abandoned.set()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    responses = []
+    for i, future in enumerate(futures):
+        response = None
+        if not future.done():
+            print(f"-- {kind} {i + 1} : délai dépassé, appel interrompu")
+        elif future.cancelled() or future.exception():
+            print(f"-- {kind} {i + 1} : échec ({future.exception() if not future.cancelled() else 'annulé'})")
+        elif future.result() and future.result() != ERROR_MESSAGE:
+            response = future.result()
+        record_generation(kind, response is not None)
+        responses.append(response)
+
+    return responses
+
+
+def get_intention_recherche(keyword, llm, on_token=None):
     question = f"""Quelle est l'intention de recherche d'une personne tapant dans Google le mot-clé : "{keyword}"? 
     Que veut-elle savoir, retrouver dans les contenus qui vont apparaitre ?"""
-    intention: str = llm.invoke(question)
+    intention: str = invoke_llm(llm, question, on_token)
 
     return intention
 
 
-def get_init_structure(keyword, intention_recherche, llm):
+def get_init_structure(keyword, intention_recherche, llm, on_token=None):
     question = f"""Nous devons rédiger un article de blog sur la thématique "{keyword}". Tu as ci-dessous un descriptif 
     de l'intention de recherche d'une personne sur ce sujet : ce qu'il aimerait savoir. Sur la base de ces informations, 
     quelle structure HN aurais-tu proposé  pour un article de blog ? Donne la structure HN en markdown. Le style et le 
@@ -80,13 +356,13 @@ def get_init_structure(keyword, intention_recherche, llm):
     ## Intention de recherche : 
     "{intention_recherche}"
     Structure Hn : """
-    init_structure: str = llm.invoke(question)
+    init_structure: str = invoke_llm(llm, question, on_token)
 
     return init_structure
 
 
 def generate_prompt_structure(subject, examples, related_questions, init_structure):
-    prompt = f"""
+    role = """
     Vous êtes un employé SEO de Docaposte. Vous devez écrire un article de blog pour le site web de Docaposte, sur un 
     sujet donné. Pour cela, vous disposez d'un premier brouillon de structure Hn que vous devez améliorer en se basant 
     sur les éléments suivants : 
@@ -96,29 +372,15 @@ def generate_prompt_structure(subject, examples, related_questions, init_structu
     rédiger. Les 3 propositions doivent se différencier sur certains points thématiques abordés.
     Votre réponse doit être uniquement un dictionnaire de 3 listes de listes Python, qui donnent les 3 structures Hn à
     utiliser pour le contenu. Votre réponse doit être comme dans les exemples ci-dessous, sans aucun commentaire.
-    
-    ### Entrées :
-    
-    1. **Sujet de l'article à rédiger** :
-    {subject}
-    
-    2. **Premier brouillon de structure Hn** :
-    {init_structure}
-    
-    3. **Exemples structures Hn des pages les mieux référencées** :
-    {examples}
-    
-    4. **Autres questions fréquentes que se posent les internautes sur le sujet** :
-    {related_questions}
-    
-    
+    """
+    instructions = """
     ### Sortie attendue :
     
     Un dictionnaire Python contenant trois propositions de structure Hn. Chaque proposition doit être sous forme de 
     liste ayant des sous listes composés de 2 éléments sous ce format : ["h1", "le titre"].
     
     Exemple de sortie :
-        {{
+        {
             "proposition1": [
                                     ["h1", "Mon titre 1"], 
                                     ["h2", "Mon sous-titre 1"], 
@@ -140,7 +402,7 @@ def generate_prompt_structure(subject, examples, related_questions, init_structu
                                     ["h1", "Mon titre 2"], 
                                     ["h1", "Mon titre 3"]
             ]
-        }}
+        }
         
     ### Instructions :
     
@@ -161,15 +423,23 @@ def generate_prompt_structure(subject, examples, related_questions, init_structu
     Chacune des propositions doit avoir des parties qui lui sont propres, en se basant sur ce qui existe dans 
     les exemples fournis et les autres questions fréquentes posées par les internautes.
     9. Éviter de nommer des solutions ou entreprises concurrentes à Docaposte.
-    
-    ### Sortie : 
-     
     """
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[
+            ("Sujet de l'article à rédiger", subject),
+            ("Exemples structures Hn des pages les mieux référencées", examples),
+            ("Autres questions fréquentes que se posent les internautes sur le sujet", related_questions),
+        ],
+        delta=[("Premier brouillon de structure Hn", init_structure)],
+        answer="### Sortie :",
+    )
     return prompt
 
 
 def generate_structure_proposals(
-    chain, subject, examples, related_questions, init_structure, n_proposals=3
+    chain, subject, examples, related_questions, init_structure, n_proposals=3, llm=None
 ):
     """
     Relancer la génération des structures tant qu'on a pas 3 propositions
@@ -180,6 +450,7 @@ def generate_structure_proposals(
         related_questions:
         init_structure:
         n_proposals:
+        llm: modèle, pour ne demander que les propositions manquantes (cf. complete_proposals)
 
     Returns:
 
@@ -187,19 +458,26 @@ def generate_structure_proposals(
     proposals = {}
     counter = 0
     max_iter = 15
+    # Les relances ignorent le cache, qui renverrait la réponse inexploitable
+    retry_chain, retry_llm = without_cache(chain), without_cache(llm)
     while (counter < max_iter) and (len(proposals) < n_proposals):
         prompt_structure = generate_prompt_structure(
             subject, examples, related_questions, init_structure
         )
         try:
             print("-- Start structure generation")
-            res = chain.invoke({"query": prompt_structure})
+            res = (retry_chain if counter else chain).invoke({"query": prompt_structure})
             print("-- Structure generated")
             new_proposal = res.structure
+            record_generation("structure", len(new_proposal) == n_proposals)
+            new_proposal = complete_proposals(
+                retry_llm if counter else llm, StructureHn, prompt_structure, new_proposal, "structure", n_proposals
+            )
             if len(new_proposal) == n_proposals:
                 proposals = new_proposal
         except:
             print("-- Failed to generate")
+            record_generation("structure", False)
             pass
 
         counter += 1
@@ -238,7 +516,7 @@ def generate_prompt_part_content(
 
     """
 
-    prompt = f"""
+    role = """
     Vous êtes un employé SEO de Docaposte. Vous devez participer à la rédaction d'un article de blog pour le site 
     web de Docaposte, sur un sujet donné. Vous avez à votre charge la rédaction d'une seule section de l'article.
     Pour cela, vous disposez d'une structure HN que l'article doit respecter. Vous avez aussi 3 versions du début 
@@ -255,33 +533,8 @@ def generate_prompt_part_content(
     Ces informations doivent vous permettre de fournir 3 propositions de contenu pour une section de l'article de blog à 
     rédiger, adaptées aux 3 versions du début de l'article déjà rédigées. Les 3 propositions doivent se différencier et 
     être des suites logiques aux 3 versions de début de l'article déjà rédigées.
-
-    ### Entrées :
-
-    1. **Sujet de l'article à rédiger** :
-        {subject}
-
-    2. **Intention de recherche des utilisateurs à travers ce sujet** :
-        {intention_recherche}
-
-    3. **Autres questions similaires que se posent les internautes sur le sujet** :
-        {related_questions}
-
-    4. **Mots clés importants pour l'article à rédiger** :
-        {mots_cles}
-
-    4. **Structure Hn à respecter** :
-        {structure_hn}
-
-    5. **Exemples d'articles** :
-        {examples}
-
-    6. **3 versions de début de l'article déjà rédigé** :
-        {article_start}
-
-    7. **Partie de l'article à rédiger** :
-        {part_cible}
-
+    """
+    instructions = """
     ### Sortie attendue :
 
     Une liste Python contenant trois propositions de texte pour la partie correspondante de l'article, chaque 
@@ -319,9 +572,23 @@ def generate_prompt_part_content(
         accessible et enthousiaste.
     12. Le contenu généré doit avoir une approche pyramidale, en commençant par les éléments les plus généraux pour 
     ensuite aller progressivement vers des détails plus spécifiques.
-    
-    ### Réponse : 
     """
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[
+            ("Sujet de l'article à rédiger", subject),
+            ("Intention de recherche des utilisateurs à travers ce sujet", intention_recherche),
+            ("Autres questions similaires que se posent les internautes sur le sujet", related_questions),
+            ("Mots clés importants pour l'article à rédiger", mots_cles),
+            ("Structure Hn à respecter", structure_hn),
+            ("Exemples d'articles", examples),
+        ],
+        delta=[
+            ("3 versions de début de l'article déjà rédigé", article_start),
+            ("Partie de l'article à rédiger", part_cible),
+        ],
+    )
     return prompt
 
 
@@ -335,6 +602,7 @@ def get_part_content_proposals(
     related_questions,
     article_start,
     part_cible,
+    llm=None,
 ):
     """
     Relancer la génération du contenu tant qu'il n'y a pas 3 propositions
@@ -349,6 +617,7 @@ def get_part_content_proposals(
         related_questions:
         article_start:
         part_cible:
+        llm: modèle, pour ne demander que les propositions manquantes (cf. complete_proposals)
 
     Returns:
 
@@ -357,6 +626,8 @@ def get_part_content_proposals(
     counter = 0
     max_iter = 15
     n_proposals = 3
+    # Les relances ignorent le cache, qui renverrait la réponse inexploitable
+    retry_chain, retry_llm = without_cache(chain), without_cache(llm)
     while (counter < max_iter) and (len(proposals) < n_proposals):
         prompt_part_content = generate_prompt_part_content(
             subject,
@@ -370,15 +641,25 @@ def get_part_content_proposals(
         )
         try:
             print("-- Start generation")
-            res = chain.invoke({"query": prompt_part_content})
+            res = (retry_chain if counter else chain).invoke({"query": prompt_part_content})
             print("-- Content generated")
             new_proposal = res.content
-            if len(new_proposal) == n_proposals:
-                proposals = new_proposal
+            record_generation("part_content", len(new_proposal) == n_proposals)
+            if len(new_proposal) >= n_proposals:
+                proposals = new_proposal[:n_proposals]
             else:
-                proposals += new_proposal
+                # Propositions partielles : ajoutées à celles des tentatives précédentes, sans dépasser n_proposals
+                proposals = complete_proposals(
+                    retry_llm if counter else llm,
+                    PartContent,
+                    prompt_part_content,
+                    merge_proposals(proposals, new_proposal, n_proposals),
+                    "part_content",
+                    n_proposals,
+                )
         except:
             print("-- Failed to generate")
+            record_generation("part_content", False)
             pass
 
         counter += 1
@@ -395,23 +676,30 @@ def get_part_content_proposals(
     return proposals
 
 
-def get_summary(prompt_summary, chain_summary, st):
-    """loop to get the format"""
+def get_summary(prompt_summary, chain_summary, st, llm=None):
+    """loop to get the format (avec llm, seules les propositions manquantes sont redemandées)"""
     summary_len = 0
     counter = 0
     max_iter = 25
+    # Les relances ignorent le cache, qui renverrait la réponse inexploitable
+    retry_chain, retry_llm = without_cache(chain_summary), without_cache(llm)
     while (counter < max_iter) & (summary_len < 3):
         try:
             print("-- Start summary generation")
-            res_summary_llm = chain_summary.invoke({"query": prompt_summary})
+            res_summary_llm = (retry_chain if counter else chain_summary).invoke({"query": prompt_summary})
             # res_summary_llm = st.session_state.llm.invoke(prompt_summary)
             # print(res_summary_llm)
-            summary_len = len(res_summary_llm.summary)
-            st.session_state.summary_suggests = res_summary_llm.summary
+            record_generation("summary", len(res_summary_llm.summary) >= 3)
+            summary = complete_proposals(
+                retry_llm if counter else llm, Summary, prompt_summary, res_summary_llm.summary, "summary"
+            )
+            summary_len = len(summary)
+            st.session_state.summary_suggests = summary
             print(f"-- counter {counter} summary_len  {summary_len}")
 
         except:
             print(f"-- Failed to generate {counter}")
+            record_generation("summary", False)
             st.session_state["summary_ready"] = False
             pass
 
@@ -434,10 +722,16 @@ def get_all_content_proposals(
     intention_recherche,
     mots_cles,
     related_questions,
+    llm=None,
+    context_mode=None,
 ):
     """
     Générer tout le contenu de manière séquentielle
 
+    En mode "full", chaque section est rédigée à partir des 3 versions complètes du début de l'article : la
+    taille des prompts croît avec chaque section. En mode "rolling", chaque version n'est résumée que par un
+    contexte borné (cf. RollingContext) : la taille des prompts reste à peu près constante.
+
     Args:
         chain:
         subject:
@@ -446,22 +740,30 @@ def get_all_content_proposals(
         intention_recherche:
         mots_cles:
         related_questions:
+        llm: modèle, pour ne demander que les propositions manquantes (cf. complete_proposals)
+        context_mode: "full" ou "rolling", par défaut CONTENT_GENERATION.CONTEXT_MODE de config.yml
 
     Returns:
 
     """
+    config = get_content_generation_config()
+    context_mode = context_mode or config["CONTEXT_MODE"]
 
     articles = ": ".join((structure_hn[0]))
+    contexts = [
+        RollingContext(articles, config["SUMMARY_WORDS"], config["SENTENCE_WORDS"]) for _ in range(3)
+    ]
     articles = [articles, articles, articles]
     for i in range(len(structure_hn)):
         if i == 0:
             continue
 
         part_cible = ": ".join((structure_hn[i]))
+        starts = [c.render() for c in contexts] if context_mode == "rolling" else articles
         debut_art = "\n\n---\n".join(
             [
-                "Version " + str(a + 1) + ": \n\n" + articles[a]
-                for a in range(len(articles))
+                "Version " + str(a + 1) + ": \n\n" + starts[a]
+                for a in range(len(starts))
             ]
         )
         proposals = get_part_content_proposals(
@@ -474,11 +776,446 @@ def get_all_content_proposals(
             related_questions,
             debut_art,
             part_cible,
+            llm=llm,
         )
         articles = [
             art + "\n\n" + part_cible + "\n\n" + prop
             for art, prop in zip(articles, proposals)
         ]
+        for context, prop in zip(contexts, proposals):
+            context.update(part_cible, prop)
+
+    return articles
+
+
+# Style de chacune des 3 versions de l'article (même ordre que les propositions de PartContent)
+VERSION_STYLES = [
+    "Le texte doit contenir plusieurs exemples présentés avec pédagogie, dont certains basés sur des personas, en "
+    "évitant d'utiliser tout le temps l'expression 'Par exemple ... '.",
+    "Le texte doit commencer par une transition originale avec la section précédente et se terminer en annonçant "
+    "la suite de l'article d'une manière enthousiaste.",
+    "Le texte doit être très détaillé dans les explications, avec une tonalité légèrement formelle, mais "
+    "accessible et enthousiaste.",
+]
+
+
+def generate_prompt_section(
+    subject,
+    structure_hn,
+    examples,
+    intention_recherche,
+    mots_cles,
+    related_questions,
+    article_start,
+    part_cible,
+    style,
+    context_label="Début de l'article déjà rédigé",
+):
+    """
+    Rédiger une section pour une seule version de l'article (une seule proposition, en texte brut)
+    Args:
+        subject:
+        structure_hn:
+        examples:
+        intention_recherche:
+        mots_cles:
+        related_questions:
+        article_start: début de cette version de l'article (complet, ou contexte borné en mode rolling)
+        part_cible:
+        style: consigne de style de la version (cf. VERSION_STYLES)
+        context_label: intitulé de article_start dans le prompt
+
+    Returns:
+
+    """
+
+    role = """
+    Vous êtes un employé SEO de Docaposte. Vous participez à la rédaction d'un article de blog pour le site web de 
+    Docaposte et vous devez rédiger une seule section de l'article, qui doit s'inscrire logiquement dans le reste 
+    de l'article.
+    """
+    instructions = """
+    ### Instructions :
+
+    1. Répondre uniquement avec le texte de la section, sans son titre, sans commentaire et sans mise en forme JSON.
+    2. Utiliser un ton de blog rassurant, expert et pédagogique, en vouvoyant le lecteur et en parlant pour le compte 
+    de Docaposte.
+    3. Éviter de nommer des solutions ou entreprises concurrentes à Docaposte.
+    4. Ne pas empiéter sur une autre partie de la structure HN ni répéter les sections déjà rédigées.
+    5. Avoir une approche pyramidale, des éléments les plus généraux vers les détails plus spécifiques.
+    6. Respecter le style de rédaction de la version, donné dans les entrées.
+    """
+    # Le style vient après le contexte du mot clé : les 3 versions partagent le même préfixe
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[
+            ("Sujet de l'article à rédiger", subject),
+            ("Intention de recherche des utilisateurs à travers ce sujet", intention_recherche),
+            ("Autres questions similaires que se posent les internautes sur le sujet", related_questions),
+            ("Mots clés importants pour l'article à rédiger", mots_cles),
+            ("Structure Hn à respecter", structure_hn),
+            ("Exemples d'articles", examples),
+        ],
+        delta=[
+            ("Style de rédaction de la version", style),
+            (context_label, article_start),
+            ("Partie de l'article à rédiger", part_cible),
+        ],
+    )
+    return prompt
+
+
+async def agenerate_section(llm, prompt, part_cible, max_attempts=3) -> str:
+    """Rédiger une section en texte brut, relancée en cas d'échec ou de réponse vide (texte vide en dernier recours)"""
+    for attempt in range(max_attempts):
+        try:
+            # Les relances ignorent le cache, qui renverrait la réponse inexploitable
+            text = (await (without_cache(llm) if attempt else llm).ainvoke(prompt)).strip()
+        except Exception as e:
+            print(f"-- Failed to generate {part_cible} : {e}")
+            text = ""
+        valid = bool(text) and text != ERROR_MESSAGE
+        record_generation("section", valid)
+        if valid:
+            return text
+
+    return ""
+
+
+async def agenerate_version(
+    llm,
+    subject,
+    structure_hn,
+    examples,
+    intention_recherche,
+    mots_cles,
+    related_questions,
+    style,
+    context_mode="rolling",
+    max_attempts=3,
+):
+    """
+    Rédiger une version de l'article section par section, indépendamment des autres versions
+
+    Returns: la version complète ("hn: titre" suivi du contenu pour chaque section), avec un contenu vide pour
+    les sections dont la rédaction a échoué max_attempts fois
+
+    """
+    config = get_content_generation_config()
+    article = ": ".join((structure_hn[0]))
+    context = RollingContext(article, config["SUMMARY_WORDS"], config["SENTENCE_WORDS"])
+    for part in structure_hn[1:]:
+        part_cible = ": ".join(part)
+        prompt = generate_prompt_section(
+            subject,
+            structure_hn,
+            examples,
+            intention_recherche,
+            mots_cles,
+            related_questions,
+            context.render() if context_mode == "rolling" else article,
+            part_cible,
+            style,
+        )
+        text = await agenerate_section(llm, prompt, part_cible, max_attempts)
+        article += "\n\n" + part_cible + "\n\n" + text
+        context.update(part_cible, text)
+
+    return article
+
+
+def get_all_content_versions(
+    llm,
+    subject,
+    structure_hn,
+    examples,
+    intention_recherche,
+    mots_cles,
+    related_questions,
+    context_mode=None,
+):
+    """
+    Générer les 3 versions de l'article par 3 rédactions indépendantes, exécutées en parallèle
+
+    Chaque version (exemples, transitions, détails) a son propre prompt par section, avec une seule
+    proposition en sortie : le temps total est celui de la version la plus lente, au lieu d'un appel par section
+    qui produit les 3 propositions à la fois (cf. get_all_content_proposals).
+
+    Args:
+        llm: modèle LangChain (appels asynchrones)
+        subject:
+        structure_hn:
+        examples:
+        intention_recherche:
+        mots_cles:
+        related_questions:
+        context_mode: "full" ou "rolling", par défaut CONTENT_GENERATION.CONTEXT_MODE de config.yml
+
+    Returns: les 3 versions de l'article, dans l'ordre de VERSION_STYLES
+
+    """
+    context_mode = context_mode or get_content_generation_config()["CONTEXT_MODE"]
+
+    async def generate_all():
+        return await asyncio.gather(
+            *[
+                agenerate_version(
+                    llm,
+                    subject,
+                    structure_hn,
+                    examples,
+                    intention_recherche,
+                    mots_cles,
+                    related_questions,
+                    style,
+                    context_mode,
+                )
+                for style in VERSION_STYLES
+            ]
+        )
+
+    return list(get_transport().run(generate_all()))
+
+
+def generate_prompt_skeleton(
+    subject, structure_hn, examples, intention_recherche, mots_cles, related_questions
+):
+    """
+    Brief de toutes les sections de l'article en un seul appel : points clés et accroche de transition
+    Args:
+        subject:
+        structure_hn:
+        examples:
+        intention_recherche:
+        mots_cles:
+        related_questions:
+
+    Returns:
+
+    """
+    sections = "\n".join(f"{i + 1}. {': '.join(part)}" for i, part in enumerate(structure_hn[1:]))
+    role = """
+    Vous êtes un employé SEO de Docaposte. Avant la rédaction d'un article de blog pour le site web de Docaposte, 
+    vous devez préparer un brief court pour chacune des sections de l'article : les points clés à y traiter et 
+    l'accroche qui fera la transition vers la section suivante.
+    """
+    instructions = """
+    ### Instructions :
+
+    1. Fournir exactement le nombre de briefs demandé, un par section et dans l'ordre des sections.
+    2. Les points clés tiennent en 2 ou 3 phrases courtes et ne doivent pas se répéter d'une section à l'autre.
+    3. L'accroche de transition tient en une phrase ; pour la dernière section, elle annonce la conclusion.
+    4. Répartir les mots clés entre les sections et éviter de nommer des solutions ou entreprises concurrentes à 
+    Docaposte.
+    """
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[
+            ("Sujet de l'article à rédiger", subject),
+            ("Intention de recherche des utilisateurs à travers ce sujet", intention_recherche),
+            ("Autres questions similaires que se posent les internautes sur le sujet", related_questions),
+            ("Mots clés importants pour l'article à rédiger", mots_cles),
+            (f"Sections de l'article, dans l'ordre (titre principal : {': '.join(structure_hn[0])})", sections),
+            ("Exemples d'articles", examples),
+        ],
+        delta=[("Nombre de briefs à fournir", len(structure_hn) - 1)],
+    )
+    return prompt
+
+
+def format_brief(structure_hn, brief, index) -> str:
+    """Plan de l'article avec les briefs, et consignes propres à la section index (à partir de 0, sans le h1)"""
+    plan = "\n".join(
+        f"- {': '.join(part)} : {points}" for part, (points, _) in zip(structure_hn[1:], brief)
+    )
+    previous_hook = brief[index - 1][1] if index > 0 else "Aucune (première section après l'introduction)"
+
+    return (
+        f"{plan}\n\n"
+        f"Points clés de la section à rédiger : {brief[index][0] or '(libres)'}\n"
+        f"Transition depuis la section précédente : {previous_hook}\n"
+        f"Accroche vers la section suivante : {brief[index][1] or '(libre)'}"
+    )
+
+
+def generate_prompt_stitch(subject, boundaries, style):
+    """
+    Phrases d'ouverture des sections, pour lisser les transitions entre des sections rédigées séparément
+    Args:
+        subject:
+        boundaries: pour chaque section à partir de la deuxième, tuple (fin de la section précédente, titre de la
+            section, début de la section)
+        style: consigne de style de la version (cf. VERSION_STYLES)
+
+    Returns:
+
+    """
+    transitions = "\n\n".join(
+        f"{i + 1}. Fin de la section précédente : {end}\n"
+        f"   Section : {part_cible}\n"
+        f"   Début actuel de la section : {start}"
+        for i, (end, part_cible, start) in enumerate(boundaries)
+    )
+    role = """
+    Vous êtes un employé SEO de Docaposte. Les sections d'un article de blog ont été rédigées séparément. Vous 
+    devez réécrire la première phrase de chaque section pour qu'elle fasse une transition naturelle avec la fin de 
+    la section précédente, sans changer son sens.
+    """
+    instructions = """
+    ### Instructions :
+
+    1. Fournir exactement le nombre de phrases demandé, une par transition et dans l'ordre.
+    2. Chaque phrase remplace le début actuel de la section : elle doit reprendre son information.
+    3. Varier les formulations d'une transition à l'autre, en suivant le style de rédaction de la version.
+    """
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[("Sujet de l'article", subject)],
+        delta=[
+            ("Style de rédaction de la version", style),
+            ("Nombre de phrases à fournir", len(boundaries)),
+            ("Transitions à lisser", transitions),
+        ],
+    )
+    return prompt
+
+
+async def aget_skeleton(
+    llm, subject, structure_hn, examples, intention_recherche, mots_cles, related_questions, max_attempts=3
+):
+    """Brief des sections (liste de paires [points clés, accroche]), complété par des briefs vides si besoin"""
+    n_sections = len(structure_hn) - 1
+    chain = build_chain(llm, Skeleton, n_proposals=n_sections)
+    prompt = generate_prompt_skeleton(
+        subject, structure_hn, examples, intention_recherche, mots_cles, related_questions
+    )
+    brief = []
+    for attempt in range(max_attempts):
+        try:
+            print("-- Start skeleton generation")
+            # Les relances ignorent le cache, qui renverrait la réponse inexploitable
+            res = await (without_cache(chain) if attempt else chain).ainvoke({"query": prompt})
+            brief = res.brief[:n_sections]
+        except Exception:
+            print("-- Failed to generate skeleton")
+        record_generation("skeleton", len(brief) == n_sections)
+        if brief:
+            break
+
+    return brief + [["", ""]] * (n_sections - len(brief))
+
+
+async def astitch_version(llm, subject, structure_hn, sections, style):
+    """Remplacer la première phrase de chaque section (sauf la première) par une phrase de transition"""
+    indexes = []
+    boundaries = []
+    for i in range(1, len(sections)):
+        if not sections[i - 1] or not sections[i]:
+            continue
+        indexes.append(i)
+        boundaries.append(
+            (
+                sentence_regex.split(sections[i - 1].strip())[-1],
+                ": ".join(structure_hn[i + 1]),
+                sentence_regex.split(sections[i], maxsplit=1)[0],
+            )
+        )
+    if not boundaries:
+        return sections
+
+    chain = build_chain(llm, Transitions, n_proposals=len(boundaries))
+    try:
+        transitions = (
+            await chain.ainvoke({"query": generate_prompt_stitch(subject, boundaries, style)})
+        ).transitions
+    except Exception:
+        transitions = []
+    record_generation("stitch", len(transitions) == len(boundaries))
+    if len(transitions) != len(boundaries):
+        # Sans correspondance fiable entre phrases et sections, garder les sections telles quelles
+        return sections
+
+    stitched = list(sections)
+    for i, transition in zip(indexes, transitions):
+        parts = sentence_regex.split(sections[i], maxsplit=1)
+        if transition.strip():
+            stitched[i] = " ".join([transition.strip()] + parts[1:])
+
+    return stitched
+
+
+def get_all_content_skeleton(
+    llm,
+    subject,
+    structure_hn,
+    examples,
+    intention_recherche,
+    mots_cles,
+    related_questions,
+):
+    """
+    Générer les 3 versions de l'article à partir d'un brief des sections : brief de toute la structure en un appel,
+    rédaction de toutes les sections en parallèle, puis lissage des transitions de chaque version en un appel
+
+    Le temps total est de 3 allers-retours avec le LLM quel que soit le nombre de sections, au lieu d'un par
+    section (cf. get_all_content_proposals et get_all_content_versions).
+
+    Args:
+        llm: modèle LangChain (appels asynchrones)
+        subject:
+        structure_hn:
+        examples:
+        intention_recherche:
+        mots_cles:
+        related_questions:
+
+    Returns: les 3 versions de l'article, dans l'ordre de VERSION_STYLES
+
+    """
+    semaphore = asyncio.Semaphore(get_content_generation_config()["SECTION_CONCURRENCY"])
+
+    async def draft(index, style, brief):
+        part_cible = ": ".join(structure_hn[index + 1])
+        prompt = generate_prompt_section(
+            subject,
+            structure_hn,
+            examples,
+            intention_recherche,
+            mots_cles,
+            related_questions,
+            format_brief(structure_hn, brief, index),
+            part_cible,
+            style,
+            context_label="Plan de l'article et brief de la section",
+        )
+        async with semaphore:
+            return await agenerate_section(llm, prompt, part_cible)
+
+    async def generate_all():
+        brief = await aget_skeleton(
+            llm, subject, structure_hn, examples, intention_recherche, mots_cles, related_questions
+        )
+        n_sections = len(structure_hn) - 1
+        drafts = await asyncio.gather(
+            *[draft(i, style, brief) for style in VERSION_STYLES for i in range(n_sections)]
+        )
+        versions = [drafts[v * n_sections:(v + 1) * n_sections] for v in range(len(VERSION_STYLES))]
+        return await asyncio.gather(
+            *[
+                astitch_version(llm, subject, structure_hn, sections, style)
+                for sections, style in zip(versions, VERSION_STYLES)
+            ]
+        )
+
+    articles = []
+    for sections in get_transport().run(generate_all()):
+        article = ": ".join((structure_hn[0]))
+        for part, text in zip(structure_hn[1:], sections):
+            article += "\n\n" + ": ".join(part) + "\n\n" + text
+        articles.append(article)
 
     return articles
 
@@ -514,7 +1251,7 @@ def generate_prompt_reformulate_content(
     Returns:
 
     """
-    prompt = f"""
+    role = """
     Vous êtes un employé SEO de Docaposte. Vous devez écrire un article de blog pour le site web de Docaposte, sur un 
     sujet donné. Pour cela, vous disposez d'une structure HN que l'article doit respecter et d'un premier brouillon de 
     contenu d'article. Vous devez utiliser ces inputs pour proposer une nouvelle version reformulée et résumée de 
@@ -527,33 +1264,8 @@ def generate_prompt_reformulate_content(
         - la structure HN à respecter, sous forme d'une liste avec des sous-listes du type ["h1", "titre de la section"];
         - des titres et liens d'articles similaires au sujet et disponible sur le site de Docaposte ;
         - des exemples de contenus d'articles, parlant du sujet.
-
-    ### Entrées :
-
-    1. **Sujet de l'article à rédiger** :
-        {subject}
-
-    2. **Intention de recherche des utilisateurs à travers ce sujet** :
-        {intention_recherche}
-
-    3. **Autres questions similaires que se posent les internautes sur le sujet** :
-        {related_questions}
-
-    4. **Mots clés importants pour l'article à rédiger** :
-        {mots_cles}
-
-    5. **Structure Hn à respecter** :
-        {structure_hn}
-
-    6. **Titre des thématiques similaires abordées dans des pages de Docaposte ainsi que les liens correspondants** :
-        {list_ancre}
-
-    7. **Exemples d'articles** :
-        {examples}
-
-    8. **Premiere version de l'article de blog** :
-        {article_init}
-
+    """
+    instructions = f"""
     ### Sortie attendue :
 
     L'article de blog reformulé et respectant la structure HN fournie en entrée ainsi que le format de la première 
@@ -561,8 +1273,9 @@ def generate_prompt_reformulate_content(
 
     ### Instructions :
 
-    1. Reformuler le brouillon fourni en donnant un texte final contenant environ {len_content} mots et en 
-    respecter strictement le format de sortie demandé. Utiliser au maximum les mots clés donnés pour le texte reformulé.
+    1. Reformuler le brouillon fourni en donnant un texte final contenant environ le nombre de mots visé donné en 
+    entrée et en respecter strictement le format de sortie demandé. Utiliser au maximum les mots clés donnés pour le 
+    texte reformulé.
     2. Dans la formulation des phrases, utiliser un ton adapté pour des articles de blog. S'adresser au
     lecteur en le vouvoyant et en parlant pour le compte de Docaposte. 
     3. Mettre un paragraphe d'introduction à l'article de blog après le H1 qui correspond au titre. Les autres titres de 
@@ -581,7 +1294,7 @@ def generate_prompt_reformulate_content(
     12. La conclusion devrait être sous forme d'ouverture, avec une question stimulante ou l'orientation de la réflexion
      vers d'autres aspects de la thématique, incitant ainsi à poursuivre la réflexion.
     13. Vous devez OBLIGATOIREMENT insérer dans le texte tous les liens vers les thématiques similaires abordées 
-    dans les pages de Docaposte, donnés en entrée ci-haut. Chaque lien devra être inséré une seule fois. Pour cela, 
+    dans les pages de Docaposte, donnés dans les entrées ci-dessous. Chaque lien devra être inséré une seule fois. Pour cela, 
     quand un mot ou groupe de mots présent dans le titre d'une des thématiques similaires fournies apparait dans le 
     brouillon d'article, dans la reformulation, mettre immédiatement après ce mot ou groupe de mots le lien 
     correspondant à cette thématique entre des parenthèses. Par exemple, si la thématique fournie similaire est 
@@ -594,12 +1307,32 @@ def generate_prompt_reformulate_content(
     14. Chaque lien vers les thématiques similaires abordées dans les pages de Docaposte ne doit être inséré qu'une 
     seule fois dans le texte et l'insertion devra être naturelle, subtile, en évitant les expressions du type : 
     "Pour en savoir plus, consulter cette page (lien) ...". Il faut nécessairement insérer tous les liens dans le texte.
-    
-    
-    ### Article final :
-    {supplement_prompt}
-    
+    15. Respecter la consigne propre à cette version de l'article, donnée dans les entrées.
     """
+    # Les 3 versions ne diffèrent que par le brouillon et la consigne de style, placés en dernier
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[
+            ("Sujet de l'article à rédiger", subject),
+            ("Intention de recherche des utilisateurs à travers ce sujet", intention_recherche),
+            ("Autres questions similaires que se posent les internautes sur le sujet", related_questions),
+            ("Mots clés importants pour l'article à rédiger", mots_cles),
+            ("Structure Hn à respecter", structure_hn),
+            (
+                "Titre des thématiques similaires abordées dans des pages de Docaposte ainsi que les liens "
+                "correspondants",
+                list_ancre,
+            ),
+            ("Exemples d'articles", examples),
+            ("Nombre de mots visé pour l'article final", len_content),
+        ],
+        delta=[
+            ("Premiere version de l'article de blog", article_init),
+            ("Consigne propre à cette version", supplement_prompt),
+        ],
+        answer="### Article final :",
+    )
     return prompt
 
 
@@ -667,28 +1400,14 @@ def generate_prompt_summary(
 ):
     if len(content) < 1:
         content = "inconnu"
-    prompt = f"""
+    role = """
     Vous êtes un employé SEO de Docaposte. Vous devez écrire un article de blog pour le site web de Docaposte, sur un 
     sujet donné. Vous venez de finir la rédaction et on vous demande de proposer un résumé pour cet article. Pour cela, 
     vous disposez de l'article complet et du sujet de l'article. 
     Votre objectif est maintenant de proposer 3 versions de résumés sous forme d'un dictionnaire contenant 3 textes. 
     Les résumés devront être originaux et adaptés pour un article de blog.
-
-
-    ### Entrées :
-
-    1. **Sujet de l'article** :
-        {subject}
-
-    2. **Intention de recherche des internaute lisant l'article** :
-        {intention if intention is not None else 'inconnu'}
-    
-    3. **Contenu de l'article de blog** :
-        {content if content is not None else 'inconnu'}
-
-    4. **Titre des thématiques similaires abordées dans des pages de Docaposte ainsi que les liens correspondants** :
-        {list_ancre}
-        
+    """
+    instructions = f"""
     ### Sortie attendue :
 
     Un dictionnaire Python contenant trois propositions de résumé, chaque proposition étant un texte. 
@@ -717,7 +1436,7 @@ def generate_prompt_summary(
     l’intention de recherche lorsque ces informations sont connues. 
     11. Éviter de nommer des solutions ou entreprises concurrentes à Docaposte. 
     12. Vous devez OBLIGATOIREMENT insérer dans le texte tous les liens vers les thématiques similaires abordées dans 
-    les pages de Docaposte, donnés en entrée ci-haut. Chaque lien devra être 
+    les pages de Docaposte, donnés dans les entrées ci-dessous. Chaque lien devra être 
     inséré une seule fois. Pour cela, détecter dans le contenu un mot ou groupe de mots présent dans le titre d'une des 
     thématiques similaires fournies apparait dans le texte, mettre immédiatement après ce mot ou groupe de mots le lien 
     correspondant à cette thématique entre des parenthèses. Par exemple, si la thématique fournie similaire est 
@@ -731,7 +1450,23 @@ def generate_prompt_summary(
     doit être inséré qu'une seule fois dans le texte et l'insertion devra être naturelle, subtile, en évitant les 
     expressions du type : "Pour en savoir plus, consulter cette page (lien) ...". Il faut nécessairement insérer tous 
     les liens dans le texte.
-    
-    ### Sortie : 
     """
+    prompt = layout_prompt(
+        role,
+        instructions,
+        context=[
+            ("Sujet de l'article", subject),
+            (
+                "Intention de recherche des internaute lisant l'article",
+                intention if intention is not None else "inconnu",
+            ),
+            (
+                "Titre des thématiques similaires abordées dans des pages de Docaposte ainsi que les liens "
+                "correspondants",
+                list_ancre,
+            ),
+        ],
+        delta=[("Contenu de l'article de blog", content if content is not None else "inconnu")],
+        answer="### Sortie :",
+    )
     return prompt
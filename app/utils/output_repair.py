@@ -0,0 +1,106 @@
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+
+from utils.textformatools import extract_candidate, lenient_loads
+
+
+def coerce_item(value, item_schema):
+    """Mettre une proposition au format du schéma (texte, paire de textes ou liste de paires), None sinon"""
+    if item_schema.get("type") == "string":
+        if isinstance(value, str):
+            return value.strip() or None
+        if isinstance(value, (list, tuple)) and value and all(isinstance(v, str) for v in value):
+            return "\n\n".join(value)
+        return None
+
+    if isinstance(value, dict):
+        value = list(value.values())
+    if not isinstance(value, (list, tuple)):
+        return None
+    if item_schema["items"].get("type") == "array":
+        pairs = [coerce_item(v, item_schema["items"]) for v in value]
+        pairs = [p for p in pairs if p]
+        return pairs or None
+    if len(value) < 2:
+        return None
+
+    return [str(value[0]).strip(), str(value[1]).strip()]
+
+
+def repair_output(text, output_class, n_proposals=3):
+    """
+    Réparer une sortie presque valide du LLM pour une classe de sortie à un seul champ de propositions
+
+    Traite la prose autour du JSON, les guillemets simples, les virgules finales, une liste nue au lieu de
+    l'objet attendu, une dernière proposition tronquée (écartée) et un nombre de propositions différent.
+
+    Args:
+        text: sortie brute du LLM
+        output_class: classe pydantic de la sortie attendue (StructureHn, PartContent, Title, Summary)
+        n_proposals: nombre maximal de propositions gardées
+
+    Returns: instance de output_class, éventuellement avec moins de n_proposals propositions, ou None si aucune
+    proposition n'a pu être récupérée
+
+    """
+    extracted = extract_candidate(text or "")
+    if extracted is None:
+        return None
+    candidate, truncated = extracted
+    data = lenient_loads(candidate)
+    if data is None:
+        return None
+
+    schema = output_class.schema()
+    field, field_schema = next(iter(schema["properties"].items()))
+    if isinstance(data, dict) and field in data:
+        value = data[field]
+    elif isinstance(data, dict) and len(data) == 1 and isinstance(next(iter(data.values())), (list, dict)):
+        value = next(iter(data.values()))
+    else:
+        value = data
+
+    if isinstance(value, dict):
+        items = list(value.items())
+    elif isinstance(value, (list, tuple)):
+        items = [(None, v) for v in value]
+    else:
+        return None
+    # La dernière proposition d'une sortie tronquée est incomplète
+    if truncated:
+        items = items[:-1]
+
+    is_list = field_schema["type"] == "array"
+    item_schema = field_schema["items"] if is_list else field_schema["additionalProperties"]
+    proposals = [(k, coerce_item(v, item_schema)) for k, v in items]
+    proposals = [(k, v) for k, v in proposals if v is not None][:n_proposals]
+    if not proposals:
+        return None
+
+    if is_list:
+        value = [v for _, v in proposals]
+    else:
+        value = {}
+        for i, (k, v) in enumerate(proposals):
+            key = str(k) if k is not None and str(k) not in value else f"proposition_{i + 1}"
+            value[key] = v
+    try:
+        return output_class.parse_obj({field: value})
+    except Exception:
+        return None
+
+
+class RepairingOutputParser(PydanticOutputParser):
+    """PydanticOutputParser qui tente de réparer la sortie (cf. repair_output) avant d'échouer"""
+
+    n_proposals: int = 3
+
+    def parse(self, text: str):
+        try:
+            return super().parse(text)
+        except OutputParserException:
+            repaired = repair_output(text, self.pydantic_object, self.n_proposals)
+            if repaired is None:
+                raise
+            print(f"-- Sortie réparée pour {self.pydantic_object.__name__}")
+            return repaired
@@ -0,0 +1,22 @@
+def layout_prompt(role, instructions, context, delta, answer="### Réponse :"):
+    """
+    Assembler un prompt dans un ordre stable, favorable au cache de préfixes du serveur (vLLM) : présentation et
+    consignes statiques, puis entrées communes à tous les appels d'un même mot clé, puis entrées propres à l'appel
+
+    Le serveur ne recalcule que la partie du prompt qui suit le plus long préfixe déjà vu : les consignes sont
+    partagées par tous les appels d'un même type, et le contexte du mot clé (exemples, mots clés, questions) par
+    les appels successifs d'une même génération (sections, versions, relances).
+
+    Args:
+        role: présentation de la tâche, identique pour tous les appels d'un même type
+        instructions: sortie attendue et consignes, identiques pour tous les appels d'un même type
+        context: entrées communes aux appels d'un même mot clé, liste de (intitulé, valeur) dans un ordre fixe
+        delta: entrées propres à l'appel (section à rédiger, début de l'article...), liste de (intitulé, valeur)
+        answer: amorce de la réponse
+
+    Returns: le prompt
+
+    """
+    entries = [f"{i + 1}. **{title}** :\n{value}" for i, (title, value) in enumerate(list(context) + list(delta))]
+
+    return "\n\n".join([role.strip(), instructions.strip(), "### Entrées :", *entries, answer]) + "\n"
@@ -0,0 +1,148 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from utils.config import load_config
+
+DEFAULT_RATE_LIMIT_CONFIG = {
+    "MAX_IN_FLIGHT": 32,
+    "DEFAULT_RATE": 2,
+    "DEFAULT_BURST": 4,
+    "MAX_WAIT": 30,
+    "HOSTS": {},
+}
+
+
+class RateLimited(Exception):
+    """Requête refusée : l'attente pour obtenir un créneau aurait dépassé max_wait"""
+
+
+class TokenBucket:
+    """
+    Seau à jetons : rate jetons par seconde, au plus burst d'avance.
+    Les jetons sont réservés (le solde peut devenir négatif) pour servir les requêtes dans l'ordre d'arrivée.
+    Un rate nul ou négatif bloque l'hôte : toutes les requêtes sont refusées.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, max_wait) -> float:
+        """Réserver un jeton et retourner le temps d'attente avant de pouvoir l'utiliser"""
+        if self.rate <= 0:
+            raise RateLimited("hôte bloqué (rate nul)")
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max((1 - self.tokens) / self.rate if self.tokens < 1 else 0.0, self.paused_until - now)
+            if wait > max_wait:
+                raise RateLimited(f"attente de {wait:.1f}s au-delà de {max_wait}s")
+            self.tokens -= 1
+            return wait
+
+    def pause(self, seconds):
+        """Suspendre le seau (ex : après une réponse 429)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class HostLimiter:
+    """
+    Limiteur partagé par tout le process : un seau à jetons par hôte et un nombre maximal de requêtes
+    simultanées, tous hôtes confondus. Les requêtes en excès attendent leur tour (backpressure) et les
+    temps d'attente sont mesurés par hôte.
+    """
+
+    def __init__(self, max_in_flight, default_rate, default_burst, max_wait, hosts=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.max_wait = max_wait
+        self.hosts = hosts or {}
+        self.buckets = {}
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.n_in_flight = 0
+        self.max_in_flight_seen = 0
+        self.metrics = {}
+
+    def bucket(self, host) -> TokenBucket:
+        with self.lock:
+            if host not in self.buckets:
+                host_config = self.hosts.get(host, {})
+                self.buckets[host] = TokenBucket(
+                    host_config.get("RATE", self.default_rate),
+                    host_config.get("BURST", self.default_burst),
+                )
+                self.metrics[host] = {"requests": 0, "rejected": 0, "queue_time": 0.0, "max_queue_time": 0.0}
+            return self.buckets[host]
+
+    def record(self, host, queue_time=None):
+        with self.lock:
+            metrics = self.metrics[host]
+            if queue_time is None:
+                metrics["rejected"] += 1
+                return
+            metrics["requests"] += 1
+            metrics["queue_time"] += queue_time
+            metrics["max_queue_time"] = max(metrics["max_queue_time"], queue_time)
+
+    @contextmanager
+    def slot(self, host):
+        """
+        Attendre un créneau pour requêter host
+
+        Raises: RateLimited si l'attente dépasse max_wait
+
+        """
+        start = time.monotonic()
+        bucket = self.bucket(host)
+        try:
+            wait = bucket.reserve(self.max_wait)
+        except RateLimited:
+            self.record(host)
+            raise
+        if wait > 0:
+            time.sleep(wait)
+        if not self.in_flight.acquire(timeout=max(self.max_wait - wait, 0)):
+            self.record(host)
+            raise RateLimited(f"{host} : plus de créneau libre après {self.max_wait}s")
+
+        self.record(host, time.monotonic() - start)
+        with self.lock:
+            self.n_in_flight += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self.n_in_flight)
+        try:
+            yield bucket
+        finally:
+            with self.lock:
+                self.n_in_flight -= 1
+            self.in_flight.release()
+
+    def stats(self) -> dict:
+        """Requêtes, refus et temps d'attente (total, moyen, max) par hôte, requêtes en cours"""
+        with self.lock:
+            hosts = {
+                host: {**m, "mean_queue_time": m["queue_time"] / m["requests"] if m["requests"] else 0.0}
+                for host, m in self.metrics.items()
+            }
+            return {"in_flight": self.n_in_flight, "max_in_flight": self.max_in_flight_seen, "hosts": hosts}
+
+
+@lru_cache
+def get_limiter() -> HostLimiter:
+    """Limiteur partagé par toutes les sessions (cf. RATE_LIMIT de config.yml)"""
+    rate_config = {**DEFAULT_RATE_LIMIT_CONFIG, **(load_config().get("RATE_LIMIT") or {})}
+    return HostLimiter(
+        max_in_flight=rate_config["MAX_IN_FLIGHT"],
+        default_rate=rate_config["DEFAULT_RATE"],
+        default_burst=rate_config["DEFAULT_BURST"],
+        max_wait=rate_config["MAX_WAIT"],
+        hosts=rate_config["HOSTS"],
+    )
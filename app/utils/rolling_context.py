@@ -0,0 +1,64 @@
+from utils.compression import sentence_regex
+
+
+class RollingContext:
+    """
+    Contexte borné d'une version de l'article en cours de rédaction, qui remplace le début complet de l'article
+    dans le prompt de la section suivante
+
+    Le contexte contient un résumé courant (une ligne par section : titre et première phrase), la dernière
+    section rédigée mot pour mot et la liste des sections déjà traitées. Au-delà de summary_words mots, les
+    lignes les plus anciennes du résumé sont réduites à leur titre, puis retirées : la taille du contexte ne
+    dépend donc pas de la longueur de l'article.
+    """
+
+    def __init__(self, title, summary_words=200, sentence_words=30, max_covered=15):
+        self.summary = []
+        self.covered = []
+        self.last_section = title
+        self.n_dropped = 0
+        self.summary_words = summary_words
+        self.sentence_words = sentence_words
+        self.max_covered = max_covered
+
+    def gist(self, text) -> str:
+        """Première phrase du texte, coupée à sentence_words mots"""
+        sentences = sentence_regex.split((text or "").strip(), maxsplit=1)
+        words = sentences[0].split() if sentences else []
+        if len(words) > self.sentence_words:
+            return " ".join(words[: self.sentence_words]) + "…"
+        return " ".join(words)
+
+    def n_summary_words(self) -> int:
+        return sum(len(title.split()) + len(gist.split()) for title, gist in self.summary)
+
+    def update(self, part_cible, text):
+        """Ajouter une section rédigée (titre "hn: titre" et contenu)"""
+        self.summary.append((part_cible, self.gist(text)))
+        self.covered.append(part_cible.split(": ", 1)[-1])
+        self.last_section = part_cible + "\n\n" + text
+
+        # Réduire d'abord les lignes les plus anciennes à leur titre (sauf la dernière section)
+        for i in range(len(self.summary) - 1):
+            if self.n_summary_words() <= self.summary_words:
+                break
+            self.summary[i] = (self.summary[i][0], "")
+        # Puis retirer les plus anciennes
+        while self.n_summary_words() > self.summary_words and len(self.summary) > 1:
+            self.summary.pop(0)
+            self.n_dropped += 1
+
+    def render(self) -> str:
+        covered = self.covered[-self.max_covered:]
+        if len(self.covered) > len(covered):
+            covered = ["…"] + covered
+        summary = [f"- {title}" + (f" : {gist}" if gist else "") for title, gist in self.summary]
+        if self.n_dropped:
+            summary = [f"- ({self.n_dropped} sections précédentes)"] + summary
+        summary = "\n".join(summary)
+
+        return (
+            f"Résumé de ce qui a déjà été rédigé :\n{summary or '- (rien)'}\n\n"
+            f"Sections déjà traitées (ne pas les répéter) : {', '.join(covered) or '(aucune)'}\n\n"
+            f"Dernière section rédigée (à prolonger) :\n{self.last_section}"
+        )
@@ -0,0 +1,198 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+from utils.keyword_matcher import get_keyword_matcher
+from utils.textformatools import normalize_text, parse_hn_from_dict, tokenize
+
+# Nombre de mots minimal d'un concurrent pour être pris en compte dans la longueur cible
+MIN_WORDS_CONTENT = 100
+TOP_TERMS = 30
+MAX_CACHED_KEYWORDS = 32
+
+section_regex = re.compile(r"\bH[1-6]: ")
+stats_cache = OrderedDict()
+stats_cache_lock = threading.Lock()
+
+
+def term_document_matrix(contents):
+    """
+    Matrice creuse termes-documents (nombre d'occurrences de chaque terme dans chaque contenu)
+
+    Returns: tuple (matrice n_documents x n_termes, liste des termes)
+
+    """
+    vocabulary = {}
+    rows, cols = [], []
+    for d, text in enumerate(contents):
+        for t in tokenize(section_regex.sub(" ", text)):
+            cols.append(vocabulary.setdefault(t, len(vocabulary)))
+            rows.append(d)
+    # Les couples (document, terme) en double sont additionnés
+    matrix = csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(contents), len(vocabulary))
+    )
+    return matrix, list(vocabulary)
+
+
+def tfidf(matrix):
+    """TF-IDF (tf normalisé par la longueur du document, idf lissé) d'une matrice termes-documents"""
+    n_docs = matrix.shape[0]
+    df = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    doc_len = np.asarray(matrix.sum(axis=1)).ravel()
+    tf = diags(1 / np.maximum(doc_len, 1)) @ matrix
+    return csr_matrix(tf.multiply(idf)), idf
+
+
+def heading_levels(concurrents_data):
+    """Nombre de titres de chaque niveau (h1 à h6) par concurrent"""
+    levels = np.zeros((len(concurrents_data), 6))
+    for d, concurrent in enumerate(concurrents_data):
+        for level, _ in parse_hn_from_dict(concurrent["headings"] or {}):
+            digit = str(level)[-1:]
+            if digit.isdigit() and 1 <= int(digit) <= 6:
+                levels[d, int(digit) - 1] += 1
+    return levels
+
+
+def build_corpus_stats(concurrents_data, keywords) -> dict:
+    """
+    Calculer en une fois les statistiques SEO du corpus des concurrents
+
+    Args:
+        concurrents_data: concurrents issus de parse_semrank_object (content, nb_words, headings)
+        keywords: liste des mots clés de l'article
+
+    Returns: dictionnaire (sérialisable) avec :
+        - len_content : nombre de mots cible (moyenne des concurrents de plus de MIN_WORDS_CONTENT mots) ;
+        - top_terms : termes les plus importants du corpus en TF-IDF, avec leur poids ;
+        - keywords : pour chaque mot clé, importance TF-IDF, part des concurrents qui l'utilisent et densité
+          cible (occurrences pour 1000 mots, médiane des concurrents qui l'utilisent) ;
+        - headings : nombre moyen de titres par niveau et répartition des niveaux ;
+        - sections : statistiques de longueur (en mots) des sections des concurrents.
+
+    """
+    contents = [c["content"] or "" for c in concurrents_data]
+    n_docs = len(contents)
+    nb_words = np.array([c["nb_words"] or 0 for c in concurrents_data], dtype=float)
+    long_contents = nb_words[nb_words > MIN_WORDS_CONTENT]
+    if len(long_contents):
+        len_content = int(np.mean(long_contents))
+    else:
+        len_content = int(np.mean(nb_words)) if n_docs else 0
+
+    # => Termes importants du corpus
+    matrix, vocabulary = term_document_matrix(contents)
+    top_terms = []
+    if matrix.shape[1]:
+        weights, _ = tfidf(matrix)
+        importance = np.asarray(weights.mean(axis=0)).ravel()
+        top_terms = [(vocabulary[i], float(importance[i])) for i in np.argsort(-importance)[:TOP_TERMS]]
+
+    # => Mots clés : une seule passe par contenu pour tous les mots clés
+    keywords = list(dict.fromkeys(keywords))
+    keywords_stats = {}
+    if keywords and n_docs:
+        matcher = get_keyword_matcher(tuple(keywords))
+        counts = np.array([[matcher.analyze(text)["counts"][k] for k in keywords] for text in contents], float)
+        words = np.array([max(len(text.split()), 1) for text in contents], dtype=float)
+        density = counts / words[:, None] * 1000
+        presence = counts > 0
+        doc_freq = presence.mean(axis=0)
+        idf = np.log((1 + n_docs) / (1 + presence.sum(axis=0))) + 1
+        importance = (counts / words[:, None]).mean(axis=0) * idf
+        used = presence.any(axis=0)
+        target = np.zeros(len(keywords))
+        if used.any():
+            target[used] = np.nanmedian(np.where(presence, density, np.nan)[:, used], axis=0)
+        for i, k in enumerate(keywords):
+            keywords_stats[k] = {
+                "importance": float(importance[i]),
+                "doc_freq": float(doc_freq[i]),
+                "target_density": float(target[i]),
+            }
+
+    # => Profondeur des structures Hn
+    levels = heading_levels(concurrents_data)
+    total_headings = levels.sum()
+    headings = {
+        "mean_per_level": levels.mean(axis=0).tolist() if n_docs else [0.0] * 6,
+        "share_per_level": (levels.sum(axis=0) / total_headings).tolist() if total_headings else [0.0] * 6,
+    }
+
+    # => Longueur des sections
+    section_words = np.array(
+        [len(s.split()) for text in contents for s in section_regex.split(text) if s.strip()], dtype=float
+    )
+    sections = {"count": int(len(section_words)), "mean": 0.0, "median": 0.0, "p25": 0.0, "p75": 0.0}
+    if len(section_words):
+        p25, median, p75 = np.percentile(section_words, [25, 50, 75])
+        sections.update(mean=float(section_words.mean()), median=float(median), p25=float(p25), p75=float(p75))
+
+    return {
+        "len_content": len_content,
+        "top_terms": top_terms,
+        "keywords": keywords_stats,
+        "headings": headings,
+        "sections": sections,
+    }
+
+
+def get_corpus_stats(keyword, concurrents_data, keywords) -> dict:
+    """Statistiques du corpus (cf. build_corpus_stats), calculées une fois par mot clé et liste de mots clés"""
+    key = (
+        " ".join(normalize_text(keyword).split()),
+        tuple(c["url"] for c in concurrents_data),
+        tuple(keywords),
+    )
+    with stats_cache_lock:
+        if key in stats_cache:
+            stats_cache.move_to_end(key)
+            return stats_cache[key]
+
+    stats = build_corpus_stats(concurrents_data, keywords)
+    with stats_cache_lock:
+        stats_cache[key] = stats
+        while len(stats_cache) > MAX_CACHED_KEYWORDS:
+            stats_cache.popitem(last=False)
+
+    return stats
+
+
+def keyword_target_count(stats, keyword, n_words) -> int:
+    """Nombre d'occurrences visé pour un mot clé dans un texte de n_words mots (0 si pas de cible)"""
+    keyword_stats = stats["keywords"].get(keyword) if stats else None
+    if not keyword_stats or keyword_stats["target_density"] <= 0:
+        return 0
+    return max(1, round(keyword_stats["target_density"] * n_words / 1000))
+
+
+def format_keyword_targets(stats, keywords, n_words) -> str:
+    """Liste des mots clés pour les prompts, avec le nombre d'occurrences visé quand il est connu"""
+    formatted = []
+    for k in keywords:
+        target = keyword_target_count(stats, k, n_words)
+        formatted.append(f"{k} (environ {target} fois)" if target else k)
+    return ", ".join(formatted)
+
+
+def density_coverage(stats, counts, n_words) -> int:
+    """
+    Part (entre 0 et 100) des mots clés avec une cible qui l'atteignent dans un texte
+
+    Args:
+        stats: statistiques du corpus (cf. build_corpus_stats)
+        counts: occurrences de chaque mot clé dans le texte (cf. KeywordMatcher.analyze)
+        n_words: nombre de mots du texte
+
+    """
+    targets = {k: keyword_target_count(stats, k, n_words) for k in counts}
+    targets = {k: t for k, t in targets.items() if t > 0}
+    if not targets:
+        return 100
+    reached = sum(counts[k] >= t for k, t in targets.items())
+    return int(100 * reached / len(targets))
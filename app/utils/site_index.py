@@ -0,0 +1,221 @@
+"""
+Index hors ligne des pages du site Docaposte pour le maillage interne.
+
+L'index est construit à partir du sitemap du site (ou d'un export de crawl au format JSONL avec les clés url,
+title, content) puis interrogé en BM25, sans aucun appel réseau. Mise à jour incrémentale, depuis la racine
+du projet :
+
+    PYTHONPATH=app python -m utils.site_index refresh
+    PYTHONPATH=app python -m utils.site_index refresh --dump crawl.jsonl
+    PYTHONPATH=app python -m utils.site_index search "signature électronique"
+"""
+import argparse
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import Counter
+from functools import lru_cache
+
+from rank_bm25 import BM25Okapi
+
+from utils import http_client
+from utils.config import load_config
+from utils.textformatools import tokenize
+from utils.tools import anchor_from_url, fetch_backlinks_content, format_ancre, google_search
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+SITEMAP_TYPES = ["application/xml", "text/xml"]
+# Poids du titre et de l'ancre par rapport au corps de la page
+TITLE_WEIGHT = 3
+
+
+class SiteIndex:
+    """Index BM25 des pages du site : titre, ancre déduite du slug et termes principaux du corps"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.bm25 = None
+        if docs:
+            corpus = [[t for t, n in d["terms"].items() for _ in range(n)] for d in docs]
+            self.bm25 = BM25Okapi(corpus)
+
+    def search(self, query, k=5) -> list:
+        """
+        Chercher les pages les plus proches d'une requête
+
+        Args:
+            query: texte de la requête (mot clé)
+            k: nombre de pages à retourner
+
+        Returns: liste des k meilleures pages (dictionnaires url, title, anchor...), les plus pertinentes d'abord
+
+        """
+        tokens = tokenize(query)
+        if self.bm25 is None or not tokens:
+            return []
+        scores = self.bm25.get_scores(tokens)
+        ranked = sorted(range(len(self.docs)), key=lambda i: scores[i], reverse=True)
+        return [self.docs[i] for i in ranked[:k] if scores[i] > 0]
+
+
+def build_doc(url, title="", content="", lastmod="", max_body_terms=200) -> dict:
+    """Entrée de l'index pour une page"""
+    anchor = anchor_from_url(url)
+    terms = Counter(tokenize(content)).most_common(max_body_terms)
+    terms = Counter(dict(terms))
+    for t in tokenize(f"{title} {anchor}"):
+        terms[t] += TITLE_WEIGHT
+
+    return {"url": url, "title": title, "anchor": anchor, "lastmod": lastmod, "terms": dict(terms)}
+
+
+def read_sitemap(url) -> dict:
+    """
+    Lire un sitemap (ou un index de sitemaps, récursivement)
+
+    Returns: dictionnaire url => date de dernière modification ("" si absente)
+
+    """
+    root = ET.fromstring(http_client.download(url, allowed_types=SITEMAP_TYPES))
+    pages = {}
+    for sitemap in root.iter(f"{SITEMAP_NS}sitemap"):
+        pages.update(read_sitemap(sitemap.findtext(f"{SITEMAP_NS}loc").strip()))
+    for page in root.iter(f"{SITEMAP_NS}url"):
+        pages[page.findtext(f"{SITEMAP_NS}loc").strip()] = (page.findtext(f"{SITEMAP_NS}lastmod") or "").strip()
+
+    return pages
+
+
+def load_docs(path) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_docs(docs, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def refresh_index(path, sitemap=None, dump=None, max_body_terms=200, full=False) -> dict:
+    """
+    Mettre à jour l'index : seules les pages nouvelles ou modifiées (lastmod) sont téléchargées
+
+    Args:
+        path: fichier de l'index
+        sitemap: url du sitemap du site
+        dump: export de crawl JSONL (url, title, content, lastmod optionnel), utilisé à la place du sitemap
+        max_body_terms: nombre de termes du corps gardés par page
+        full: reconstruire tout l'index
+
+    Returns: nombre de pages ajoutées, mises à jour, inchangées et supprimées
+
+    """
+    existing = {} if full else {d["url"]: d for d in load_docs(path)}
+    docs = {}
+    stats = {"added": 0, "updated": 0, "kept": 0, "removed": 0}
+
+    if dump:
+        with open(dump, encoding="utf-8") as f:
+            pages = [json.loads(line) for line in f if line.strip()]
+        for page in pages:
+            docs[page["url"]] = build_doc(
+                page["url"], page.get("title", ""), page.get("content", ""), page.get("lastmod", ""), max_body_terms
+            )
+    else:
+        lastmods = read_sitemap(sitemap)
+        to_fetch = [
+            url for url, lastmod in lastmods.items()
+            if url not in existing or not lastmod or existing[url]["lastmod"] != lastmod
+        ]
+        pages = fetch_backlinks_content(to_fetch, deadline=None)
+        for url, lastmod in lastmods.items():
+            if url in pages and not pages[url]["skipped"]:
+                docs[url] = build_doc(url, pages[url]["title"], pages[url]["content"], lastmod, max_body_terms)
+            elif url in existing:
+                # Page non récupérée : l'entrée précédente est gardée avec son ancien lastmod, pour que la page
+                # soit de nouveau téléchargée à la prochaine mise à jour
+                if url in pages:
+                    print(f"-- Page non récupérée pour l'index, entrée précédente gardée : {url}")
+                docs[url] = existing[url]
+
+    for url in docs:
+        if url not in existing:
+            stats["added"] += 1
+        elif docs[url] is existing[url]:
+            stats["kept"] += 1
+        else:
+            stats["updated"] += 1
+    stats["removed"] = len([url for url in existing if url not in docs])
+
+    save_docs(list(docs.values()), path)
+
+    return stats
+
+
+@lru_cache(maxsize=1)
+def load_site_index(path, mtime) -> SiteIndex:
+    """Index chargé une fois par version du fichier (mtime)"""
+    return SiteIndex(load_docs(path))
+
+
+def get_site_index():
+    """Index du site (cf. SITE_INDEX de config.yml), ou None s'il n'a pas encore été construit"""
+    path = load_config()["SITE_INDEX"]["PATH"]
+    if not os.path.exists(path):
+        return None
+    return load_site_index(path, os.path.getmtime(path))
+
+
+def get_internal_links(query, k=None):
+    """
+    Liens internes les plus pertinents pour un mot clé, au format de format_ancre
+
+    Returns: texte des liens, ou None si l'index n'est pas disponible
+
+    """
+    index = get_site_index()
+    if index is None:
+        return None
+    k = k or load_config()["SITE_INDEX"]["TOP_K"]
+
+    return format_ancre([d["url"] for d in index.search(query, k=k)])
+
+
+def get_maillage_interne(keyword):
+    """Liens internes depuis l'index hors ligne, ou par une recherche Google site: si l'index n'existe pas"""
+    links = get_internal_links(keyword)
+    if links is None:
+        links = format_ancre(google_search(keyword))
+    return links
+
+
+def main():
+    index_config = load_config()["SITE_INDEX"]
+    parser = argparse.ArgumentParser(description="Index hors ligne des pages du site pour le maillage interne")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    refresh = subparsers.add_parser("refresh", help="Mettre à jour l'index")
+    refresh.add_argument("--sitemap", default=index_config["SITEMAP"])
+    refresh.add_argument("--dump", help="Export de crawl JSONL à utiliser à la place du sitemap")
+    refresh.add_argument("--full", action="store_true", help="Reconstruire tout l'index")
+    search = subparsers.add_parser("search", help="Tester une recherche")
+    search.add_argument("query")
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        stats = refresh_index(
+            index_config["PATH"], sitemap=args.sitemap, dump=args.dump,
+            max_body_terms=index_config["MAX_BODY_TERMS"], full=args.full,
+        )
+        print(f"Index mis à jour : {stats}")
+    else:
+        print(get_internal_links(args.query))
+
+
+if __name__ == "__main__":
+    main()
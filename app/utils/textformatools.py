@@ -4,6 +4,29 @@ import os
 from bs4 import BeautifulSoup
 import ast
 import re
+import unicodedata
+
+# Mots vides français ignorés dans la recherche de pages et le scoring de mots clés
+FRENCH_STOPWORDS = {
+    "au", "aux", "avec", "ce", "ces", "cet", "cette", "dans", "de", "des", "du", "elle", "en", "est", "et",
+    "il", "ils", "la", "le", "les", "leur", "leurs", "mais", "ne", "nos", "notre", "nous", "on", "ou", "par",
+    "pas", "pour", "qu", "que", "qui", "sa", "se", "ses", "son", "sont", "sur", "ta", "te", "un", "une",
+    "vos", "votre", "vous", "comment", "quoi", "quel", "quelle", "quels", "quelles",
+}
+
+
+def normalize_text(text: str) -> str:
+    """Mettre en minuscules et retirer les accents (é => e, ç => c...)"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str, remove_stopwords=True) -> list:
+    """Découper un texte en mots normalisés (cf. normalize_text), sans les mots vides"""
+    tokens = re.findall(r"\w+", normalize_text(text))
+    if remove_stopwords:
+        tokens = [t for t in tokens if len(t) > 1 and t not in FRENCH_STOPWORDS]
+    return tokens
 
 
 def parse_hn_from_dict(obj):
@@ -61,30 +84,76 @@ def hn_list_to_md(obj, content_exist=False) -> str:
     return res
 
 
-def extract_tuples_from_text(text) -> list:
-    s = text.find("[")
-    e = text.rfind("]")
-    try:
-        return ast.literal_eval(text[s : e + 1])
-    except:
-        return []
-
-
-def parse_text_to_dict(text: str) -> dict:
-    s = text.find("{")
-    e = text.rfind("}")
-    result_dict = {}
-    # try:
-    # Nettoyer le texte et transformer les fausses échappements
-    clean_text = text[s : e + 1].replace(
-        "\\'", "'"
-    )  # .replace("('", '("""').replace("',", '""",').replace(", '", ', """') \
-    # .replace("')", '""")')
-    # Utiliser ast.literal_eval pour évaluer le texte en un dictionnaire Python
-    result_dict = ast.literal_eval(clean_text)
-    # except:
-    #    pass
-    return result_dict
+CLOSERS = {"{": "}", "[": "]"}
+SMART_QUOTES = {"“": '"', "”": '"', "«": '"', "»": '"', "’": "'"}
+
+
+def extract_candidate(text, openers="{["):
+    """
+    Extraire le premier objet ou la première liste d'un texte, même entouré de prose ou tronqué
+
+    Les crochets et accolades sont appariés en ignorant ceux qui sont dans des chaînes (guillemets simples ou
+    doubles). Si le texte est tronqué, la chaîne en cours et les structures ouvertes sont refermées.
+
+    Returns: tuple (texte du candidat, tronqué) ou None si le texte ne contient ni objet ni liste
+
+    """
+    positions = [p for p in (text.find(o) for o in openers) if p >= 0]
+    if not positions:
+        return None
+    start = min(positions)
+    stack = []
+    quote = None
+    escape = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == quote:
+                quote = None
+            continue
+        if c in "\"'":
+            quote = c
+        elif c in CLOSERS:
+            stack.append(c)
+        elif c in "]}":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:i + 1], False
+
+    candidate = text[start:]
+    if quote:
+        candidate += quote
+    candidate = candidate.rstrip().rstrip(",").rstrip()
+    if candidate.endswith(":"):
+        candidate += ' ""'
+    candidate += "".join(CLOSERS[o] for o in reversed(stack))
+
+    return candidate, True
+
+
+def lenient_loads(candidate):
+    """Lire un JSON approximatif : JSON non strict, puis littéral Python (guillemets simples, virgules finales)"""
+    attempts = [candidate]
+    normalized = candidate
+    for smart, plain in SMART_QUOTES.items():
+        normalized = normalized.replace(smart, plain)
+    if normalized != candidate:
+        attempts.append(normalized)
+    for attempt in attempts:
+        try:
+            return json.loads(attempt, strict=False)
+        except ValueError:
+            pass
+        try:
+            return ast.literal_eval(attempt)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return None
 
 
 def generate_markdown_toc(hn_list):
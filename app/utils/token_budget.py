@@ -0,0 +1,214 @@
+import argparse
+import math
+import os
+from functools import lru_cache
+
+from utils.config import load_config
+
+DEFAULT_TOKEN_BUDGET_CONFIG = {
+    "CHARS_PER_TOKEN": 3.5,
+    "MIN_EXAMPLE_TOKENS": 300,
+    "SAFETY_MARGIN": 0.05,
+    "MODELS": {},
+}
+EXAMPLE_TEMPLATE = "## Début exemple \n{}\n## Fin exemple \n "
+
+
+def get_token_budget_config() -> dict:
+    return {**DEFAULT_TOKEN_BUDGET_CONFIG, **load_config().get("TOKEN_BUDGET", {})}
+
+
+@lru_cache(maxsize=4)
+def get_tokenizer(path):
+    """
+    Tokenizer Hugging Face du modèle, lu depuis un fichier tokenizer.json local (cf. TOKEN_BUDGET.MODELS de
+    config.yml et la commande download), ou None s'il n'est pas disponible
+
+    Rien n'est téléchargé pendant l'exécution de l'application. L'échec est gardé en cache comme le tokenizer :
+    le fichier n'est cherché qu'une fois par processus.
+
+    """
+    try:
+        from tokenizers import Tokenizer
+
+        return Tokenizer.from_file(path)
+    except Exception as e:
+        print(f"-- ATTENTION : tokenizer {path} indisponible, nombre de tokens estimé d'après les caractères : {e}")
+        return None
+
+
+class TokenCounter:
+    """
+    Compte les tokens d'un texte avec le tokenizer du modèle. Sans tokenizer (non configuré ou indisponible),
+    le nombre de tokens est estimé à partir du nombre de caractères.
+    """
+
+    def __init__(self, tokenizer_name=None, chars_per_token=3.5):
+        self.tokenizer = get_tokenizer(tokenizer_name) if tokenizer_name else None
+        self.chars_per_token = chars_per_token
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def count(self, text) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def truncate(self, text, max_tokens) -> str:
+        """Couper un texte à max_tokens tokens au plus, sur une fin de mot"""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is not None:
+            offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= max_tokens:
+                return text
+            end = offsets[max_tokens - 1][1]
+        else:
+            end = int(max_tokens * self.chars_per_token)
+            if end >= len(text):
+                return text
+        cut = text.rfind(" ", 0, end + 1)
+
+        return text[: cut if cut > 0 else end].rstrip()
+
+
+@lru_cache(maxsize=4)
+def get_token_counter(model) -> TokenCounter:
+    """Compteur de tokens d'un modèle (clé de TOKEN_BUDGET.MODELS dans config.yml)"""
+    config = get_token_budget_config()
+    model_config = config["MODELS"].get(model, {})
+
+    return TokenCounter(model_config.get("TOKENIZER"), config["CHARS_PER_TOKEN"])
+
+
+def download_tokenizers():
+    """
+    Télécharger depuis le hub Hugging Face les tokenizers des modèles (TOKENIZER_HUB) vers leur fichier local
+    (TOKENIZER), à lancer une fois avant le déploiement. Les dépôts protégés (Mixtral) demandent un jeton d'accès
+    dans la variable d'environnement HF_TOKEN.
+    """
+    from tokenizers import Tokenizer
+
+    for model, model_config in get_token_budget_config()["MODELS"].items():
+        if not model_config.get("TOKENIZER_HUB") or not model_config.get("TOKENIZER"):
+            continue
+        tokenizer = Tokenizer.from_pretrained(model_config["TOKENIZER_HUB"], auth_token=os.environ.get("HF_TOKEN"))
+        os.makedirs(os.path.dirname(model_config["TOKENIZER"]) or ".", exist_ok=True)
+        tokenizer.save(model_config["TOKENIZER"])
+        print(f"Tokenizer {model} : {model_config['TOKENIZER_HUB']} => {model_config['TOKENIZER']}")
+
+
+def format_examples(examples) -> str:
+    """Bloc d'exemples d'articles concurrents tel qu'inséré dans les prompts"""
+    return "\n".join([EXAMPLE_TEMPLATE.format(e) for e in examples])
+
+
+def examples_budget(model, reserved_tokens) -> int:
+    """
+    Nombre de tokens disponibles pour les exemples dans un prompt
+
+    Args:
+        model: clé du modèle dans TOKEN_BUDGET.MODELS
+        reserved_tokens: tokens réservés au reste du prompt (instructions, entrées, brouillon)
+
+    Returns: fenêtre de contexte du modèle, moins la sortie attendue, la réserve et une marge de sécurité,
+    plafonnée par MAX_EXAMPLES_TOKENS
+
+    """
+    config = get_token_budget_config()
+    model_config = config["MODELS"][model]
+    window = model_config["CONTEXT_WINDOW"] * (1 - config["SAFETY_MARGIN"])
+    budget = int(window - model_config["MAX_OUTPUT_TOKENS"] - reserved_tokens)
+    if model_config.get("MAX_EXAMPLES_TOKENS"):
+        budget = min(budget, model_config["MAX_EXAMPLES_TOKENS"])
+
+    return max(budget, 0)
+
+
+def pack_examples(examples, budget, counter, min_tokens=300):
+    """
+    Remplir le budget de tokens avec les exemples, dans leur ordre de classement
+
+    Les exemples qui tiennent entiers sont gardés ; s'il reste ensuite au moins min_tokens tokens, le premier
+    exemple écarté est tronqué pour remplir le reste du budget.
+
+    Args:
+        examples: contenus des concurrents, du mieux classé au moins bien classé
+        budget: nombre de tokens disponibles pour le bloc d'exemples
+        counter: TokenCounter du modèle
+        min_tokens: taille minimale d'un exemple tronqué
+
+    Returns: tuple (exemples gardés, rapport de la décision : budget, tokens utilisés et statut de chaque exemple)
+
+    """
+    separator_tokens = counter.count("\n")
+    wrapper_tokens = counter.count(EXAMPLE_TEMPLATE.format(""))
+    kept = {}
+    decisions = []
+    remaining = budget
+    for i, example in enumerate(examples):
+        tokens = counter.count(example) + wrapper_tokens + separator_tokens
+        decision = {"index": i, "tokens": tokens, "kept_tokens": 0, "status": "exclu"}
+        if tokens <= remaining:
+            kept[i] = example
+            decision.update(kept_tokens=tokens, status="entier")
+            remaining -= tokens
+        decisions.append(decision)
+
+    if remaining >= min_tokens + wrapper_tokens + separator_tokens:
+        for decision in decisions:
+            if decision["status"] == "exclu":
+                i = decision["index"]
+                kept[i] = counter.truncate(examples[i], remaining - wrapper_tokens - separator_tokens)
+                kept_tokens = counter.count(kept[i]) + wrapper_tokens + separator_tokens
+                decision.update(kept_tokens=kept_tokens, status="tronqué")
+                remaining -= kept_tokens
+                break
+
+    report = {
+        "budget": budget,
+        "used": budget - remaining,
+        "exact": counter.exact,
+        "examples": decisions,
+    }
+
+    return [kept[i] for i in sorted(kept)], report
+
+
+def pack_examples_for_prompt(model, examples, reserved_tokens):
+    """
+    Choisir les exemples à mettre dans un prompt et journaliser la décision
+
+    Returns: tuple (bloc d'exemples formaté, rapport de pack_examples complété par la réserve)
+
+    """
+    config = get_token_budget_config()
+    counter = get_token_counter(model)
+    budget = examples_budget(model, reserved_tokens)
+    packed, report = pack_examples(examples, budget, counter, config["MIN_EXAMPLE_TOKENS"])
+    report.update(model=model, reserved=reserved_tokens)
+
+    statuses = ", ".join(f"{d['index']}:{d['status']}({d['kept_tokens']}/{d['tokens']})" for d in report["examples"])
+    print(
+        f"-- Budget de tokens ({model}, {'tokenizer' if counter.exact else 'estimation'}) : réservé "
+        f"{reserved_tokens}, exemples {report['used']}/{budget} [{statuses}]"
+    )
+
+    return format_examples(packed), report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenizers des modèles pour le budget de tokens des prompts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("download", help="Télécharger les tokenizers vers les fichiers de config.yml")
+    parser.parse_args()
+
+    download_tokenizers()
+
+
+if __name__ == "__main__":
+    main()
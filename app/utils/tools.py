@@ -1,22 +1,70 @@
+import hashlib
 import json
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait
+from bs4 import Tag
 from googlesearch import search
-import requests
 import re
+import threading
+import time
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from collections import Counter
 import numpy as np
 
+from utils import http_client
+from utils.cache import SqliteCache
+from utils.config import load_config
+from utils.dedup import find_near_duplicates
+from utils.htmltools import make_soup
+from utils.keyword_matcher import get_keyword_matcher
+from utils.ratelimit import get_limiter
+
 container_name = "apps-feedback"
 data_path = "app/data/"
 
 
-def get_semrank_result(keyword: str) -> dict:
+def normalize_keyword(keyword: str) -> str:
+    """Normaliser un mot clé pour l'utiliser comme clé de cache (casse et espaces)"""
+    return " ".join(keyword.lower().split())
+
+
+@lru_cache
+def get_semrank_cache() -> SqliteCache:
+    """Cache SEMrank partagé par toutes les sessions (cf. SEMRANK_CACHE de config.yml)"""
+    cache_config = load_config()["SEMRANK_CACHE"]
+    return SqliteCache(
+        path=cache_config["PATH"],
+        table="semrank",
+        ttl=cache_config["TTL"],
+        stale_ttl=cache_config["STALE_TTL"],
+        max_size=cache_config["MAX_SIZE_MB"] * 1024 * 1024,
+    )
+
+
+def fetch_semrank_result(keyword: str) -> dict:
     """ Search for Semrank result on specific keywrods and parse it"""
-    r = requests.post(url="https://semrank.io/admin/api/keywords", data={"query": keyword})
+    r = http_client.post(url="https://semrank.io/admin/api/keywords", data={"query": keyword})
     return json.loads(r.content)
 
 
+def get_semrank_result(keyword: str) -> dict:
+    """ Search for Semrank result on specific keywords, served from cache when possible"""
+    return get_semrank_cache().get_or_fetch(
+        "keywords:" + normalize_keyword(keyword),
+        lambda: fetch_semrank_result(keyword),
+        should_cache=lambda res: "datas" in res,
+    )
+
+
+def fetch_complement_keywords(keyword):
+    """Appel de l'API SEMrank des mots clés complémentaires"""
+    r = http_client.post(url="https://semrank.io/admin/api/complement",
+                         data={"search": keyword, "spec": "words"})
+    l_kw = json.loads(r.content)
+    return sum([i for i in json.loads(l_kw["datas"]["result"]).values()], [])
+
+
 def get_complement_keywords(keyword):
     """
     Pour trouver les mots clés complémentaires à rajouter dans le contenu
@@ -28,70 +76,214 @@ def get_complement_keywords(keyword):
     """
     list_complement = []
     try:
-        r = requests.post(url="https://semrank.io/admin/api/complement",
-                          data={"search": keyword, "spec": "words"})
-        l_kw = json.loads(r.content)
-        list_complement = sum([i for i in json.loads(l_kw["datas"]["result"]).values()], [])
+        list_complement = get_semrank_cache().get_or_fetch(
+            "complement:" + normalize_keyword(keyword),
+            lambda: fetch_complement_keywords(keyword),
+        )
     except:
         pass
 
     return list_complement
 
 
-def get_hn_structure_and_content(url):
+HN_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+
+def extract_hn_structure(soup):
+    """
+    Extraire la structure Hn d'une page avec le contenu de chaque section, en un seul parcours.
+
+    Le contenu d'un titre est le texte des éléments frères qui le suivent, jusqu'au prochain titre frère de
+    niveau supérieur ou égal. Les enfants de chaque parent contenant des titres sont parcourus une seule fois
+    avec une pile des titres "ouverts" : le texte d'un élément est calculé une fois et ajouté à tous les titres
+    de la pile.
+
+    Args:
+        soup: page parsée par BeautifulSoup
+
+    Returns: liste de tuples (niveau, titre, contenu), dans l'ordre du document
+
+    """
+    headings = soup.find_all(HN_TAGS)
+    titles = {}
+    contents = {}
+    parents = {}
+    for tag in headings:
+        parents.setdefault(id(tag.parent), tag.parent)
+
+    for parent in parents.values():
+        stack = []  # Titres ouverts (niveau, liste des contenus), niveaux strictement croissants
+        for child in parent.children:
+            if not isinstance(child, Tag):
+                continue
+            is_heading = child.name in HN_TAGS
+            if is_heading:
+                level = int(child.name[1])
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+            if stack or is_heading:
+                text = child.get_text(strip=True)
+                for _, content in stack:
+                    content.append(text)
+            if is_heading:
+                titles[id(child)] = text
+                contents[id(child)] = []
+                stack.append((level, contents[id(child)]))
+
+    return [(tag.name.upper(), titles[id(tag)], ' '.join(contents[id(tag)])) for tag in headings]
+
+
+def hn_structure_to_content(hn_structure):
+    """Concaténer la structure Hn (niveau, titre, contenu) en un seul texte"""
+    return "".join([f"{level.upper()}: {title} \n\n {content}" for level, title, content in hn_structure])
+
+
+@lru_cache
+def get_page_cache() -> SqliteCache:
+    """Cache des pages scrapées, partagé par toutes les sessions (cf. PAGE_CACHE de config.yml)"""
+    cache_config = load_config()["PAGE_CACHE"]
+    return SqliteCache(
+        path=cache_config["PATH"],
+        table="pages",
+        ttl=cache_config["TTL"],
+        stale_ttl=cache_config["REVALIDATE_TTL"],
+        max_size=cache_config["MAX_SIZE_MB"] * 1024 * 1024,
+        compress=True,
+    )
+
+
+def page_cache_key(url) -> str:
+    return "page:" + hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def parse_page(content):
+    """Extraire titre, description, premier paragraphe, structure Hn et contenu d'une page HTML brute"""
+    soup = make_soup(content)
+    # Extraction du titre de la page
+    page_title = soup.title.string.strip() if soup.title else ''
+
+    # Extraction de la description de la page
+    meta_description = soup.find('meta', attrs={'name': 'description'})
+    page_description = meta_description['content'].strip() if meta_description else ''
+
+    # Premier paragraphe, utilisé comme extrait
+    first_paragraph = soup.find('p')
+    snippet = first_paragraph.get_text() if first_paragraph else ''
+
+    # Extraction de la structure Hn et du contenu associé
+    hn_structure = extract_hn_structure(soup)
+    all_content = hn_structure_to_content(hn_structure)
+
+    return {"title": page_title,
+            "description": page_description,
+            "snippet": snippet,
+            "hn_structure": hn_structure,
+            "content": all_content,
+            "skipped": None
+            }
+
+
+def get_hn_structure_and_content(url, timeout=None):
+    """
+    Scraper une page : titre, description, structure Hn et contenu.
+    Si la page n'est pas récupérée, la raison est donnée dans "skipped" (cf. http_client.DownloadSkipped)
+
+    Le résultat parsé est mis en cache avec l'ETag / Last-Modified de la page : tant qu'il est frais, il est
+    servi sans requête ; ensuite la page est revalidée par un GET conditionnel et n'est re-parsée que si son
+    contenu a changé.
+    """
     res = {"title": "",
            "description": "",
+           "snippet": "",
            "hn_structure": "",
-           "content": ""
+           "content": "",
+           "skipped": None
            }
+    cache = get_page_cache()
+    key = page_cache_key(url)
+    cached = cache.get(key)
+    entry = cached[0] if cached is not None else None
+    if entry is not None:
+        entry["result"]["hn_structure"] = [tuple(h) for h in entry["result"]["hn_structure"]]
+        if cached[1]:
+            cache.record("hits")
+            return entry["result"]
+
+    headers = {}
+    if entry is not None and entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry is not None and entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Vérifie si la requête a réussi
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-        # Extraction du titre de la page
-        page_title = soup.title.string.strip() if soup.title else ''
-
-        # Extraction de la description de la page
-        meta_description = soup.find('meta', attrs={'name': 'description'})
-        page_description = meta_description['content'].strip() if meta_description else ''
-
-        # Extraction de la structure Hn et du contenu associé
-        hn_structure = []
-        current_section = None
-
-        for tag in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            level = tag.name
-
-            # Trouver le contenu de la section
-            content = []
-            next_node = tag.find_next_sibling()
-            while next_node and (
-                    not next_node.name or not next_node.name.startswith('h') or int(next_node.name[1]) > int(level[1])):
-                content.append(next_node.get_text(strip=True))
-                next_node = next_node.find_next_sibling()
-
-            # Joindre le contenu en une seule chaîne de texte
-            content_text = ' '.join(content)
-            current_section = (tag.name.upper(), tag.get_text(strip=True), content_text)
-            hn_structure.append(current_section)
-
-        all_content = ""
-        for level, title, content in hn_structure:
-            all_content += f"{level.upper()}: {title} \n\n {content}"
-
-        res = {"title": page_title,
-               "description": page_description,
-               "hn_structure": hn_structure,
-               "content": all_content
-               }
-    except:
-        pass
+        status, response_headers, content = http_client.stream_download(url, timeout=timeout, headers=headers)
+        content_hash = hashlib.sha256(content).hexdigest()
+        if entry is not None and (status == 304 or content_hash == entry["content_hash"]):
+            # Page inchangée : pas de re-parsing
+            cache.record("stale_hits")
+            res = entry["result"]
+        else:
+            cache.record("misses")
+            res = parse_page(content)
+        cache.set(key, {"result": res,
+                        "etag": response_headers.get("ETag") or (entry or {}).get("etag"),
+                        "last_modified": (response_headers.get("Last-Modified")
+                                          or (entry or {}).get("last_modified")),
+                        "content_hash": entry["content_hash"] if status == 304 else content_hash
+                        })
+    except http_client.DownloadSkipped as e:
+        res["skipped"] = e.to_dict()
+    except Exception as e:
+        res["skipped"] = {"reason": "parsing_error", "detail": str(e)}
+    if res["skipped"] and entry is not None:
+        # Revalidation impossible (délai, erreur serveur...) : l'entrée périmée reste la meilleure réponse
+        print(f"-- Revalidation échouée pour {url}, entrée périmée servie : {res['skipped']}")
+        cache.record("stale_hits")
+        return entry["result"]
 
     return res
 
 
-def parse_semrank_object(results, top_concurrent=3):
+def fetch_backlinks_content(urls, max_workers=8, timeout=10, deadline=30):
+    """
+    Récupérer en parallèle la structure Hn et le contenu de plusieurs pages
+    Args:
+        urls: liste des urls à scraper
+        max_workers: nombre maximal de requêtes simultanées
+        timeout: timeout (en secondes) de chaque requête
+        deadline: durée maximale (en secondes) pour l'ensemble des requêtes
+
+    Returns: dictionnaire url => résultat de get_hn_structure_and_content. Les pages non récupérées avant
+    la deadline ont un résultat vide, avec la raison dans "skipped".
+
+    """
+    empty = {"title": "", "description": "", "snippet": "", "hn_structure": "", "content": ""}
+
+    def get_result(future):
+        # Résultat vide pour les pages abandonnées ou en erreur
+        if future not in done:
+            return {**empty, "skipped": {"reason": "deadline", "detail": f"non récupérée après {deadline}s"}}
+        try:
+            return future.result()
+        except Exception as e:
+            return {**empty, "skipped": {"reason": "error", "detail": str(e)}}
+
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)))
+    futures = {executor.submit(get_hn_structure_and_content, url, timeout): url for url in urls}
+    done, not_done = wait(futures, timeout=deadline)
+    # Ne pas bloquer sur les pages trop lentes : elles sont abandonnées
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        print(f"-- {len(not_done)} page(s) non récupérée(s) avant la deadline de {deadline}s")
+
+    return {url: get_result(f) for f, url in futures.items()}
+
+
+def parse_semrank_object(results, top_concurrent=3, max_workers=8, timeout=10, deadline=30, dedup=True):
     # 1. related questions
     related_questions = [i["question"] for _, i in results["datas"]["paa"].items()]
     other_related_questions = [i["query"] for _, i in results["datas"]['related'].items()]
@@ -114,7 +306,8 @@ def parse_semrank_object(results, top_concurrent=3):
              "descr": concurrent["descr"],
              "headings": concurrent["headings"],
              "nb_words": concurrent["nb_words"],
-             "content": concurrent["content"]
+             "content": concurrent["content"],
+             "skipped": None
              }
         if (concurrent["position"] in positions[:top_concurrent + 1] and
                 len(concurrents_data) < top_concurrent):
@@ -123,32 +316,41 @@ def parse_semrank_object(results, top_concurrent=3):
             docaposte_data.append(a)
 
     # Data on 'backlinks' key
+    # => Sélection des backlinks à garder (la récupération du contenu ne change pas la sélection)
+    selected_backlinks = []
     for _, b in results["datas"]["backlinks"].items():
-        # Completer objet si pas suffisant
         if (b["position"] in positions[:top_concurrent + 1] and
-                len(concurrents_data) < top_concurrent):
-            # Récupérer content et autres si absents
-            if ("content" not in b) or ("descr" not in b):
-                url_data = get_hn_structure_and_content(b["url"])
-                b["descr"] = url_data["description"]
-                b["content"] = url_data["content"]
-                b["nb_words"] = len(url_data["content"].split(' '))
-
-            a = {"position": b["position"],
-                 "title": b["title"],
-                 "snippet": b["snippet"],
-                 "url": b["url"],
-                 "descr": b["descr"] if "descr" in b else "",
-                 "headings": b["headings"],
-                 "nb_words": b["nb_words"] if "nb_words" in b else 0,
-                 "content": b["content"] if "content" in b else ""
-                 }
-            concurrents_data.append(a)
+                len(concurrents_data) + len(selected_backlinks) < top_concurrent):
+            selected_backlinks.append(b)
 
-            if "docaposte" in b["url"]:
-                docaposte_data.append(a)
-        else:
-            continue
+    # => Récupérer content et autres si absents, en parallèle pour tous les backlinks
+    urls_to_fetch = [b["url"] for b in selected_backlinks if ("content" not in b) or ("descr" not in b)]
+    urls_data = fetch_backlinks_content(urls_to_fetch, max_workers=max_workers, timeout=timeout,
+                                        deadline=deadline)
+
+    for b in selected_backlinks:
+        # Completer objet si pas suffisant
+        if b["url"] in urls_data and (("content" not in b) or ("descr" not in b)):
+            url_data = urls_data[b["url"]]
+            b["descr"] = url_data["description"]
+            b["content"] = url_data["content"]
+            b["nb_words"] = len(url_data["content"].split(' '))
+            b["skipped"] = url_data["skipped"]
+
+        a = {"position": b["position"],
+             "title": b["title"],
+             "snippet": b["snippet"],
+             "url": b["url"],
+             "descr": b["descr"] if "descr" in b else "",
+             "headings": b["headings"],
+             "nb_words": b["nb_words"] if "nb_words" in b else 0,
+             "content": b["content"] if "content" in b else "",
+             "skipped": b.get("skipped")
+             }
+        concurrents_data.append(a)
+
+        if "docaposte" in b["url"]:
+            docaposte_data.append(a)
 
     # Ordonner la liste des concurrents
     list_pos_init = [c['position'] for c in concurrents_data]
@@ -156,8 +358,14 @@ def parse_semrank_object(results, top_concurrent=3):
     index_position = [list_pos_init.index(p) for p in list_pos_ord]
     concurrents_data = [concurrents_data[p] for p in index_position]
 
+    # Écarter les pages quasi identiques (pages syndiquées, concurrent et backlink sur le même contenu...)
+    duplicates = []
+    if dedup:
+        concurrents_data, duplicates = find_near_duplicates(concurrents_data)
+
     obj = {'related_questions': related_questions, 'other_related_questions': other_related_questions,
-           'docaposte_data': docaposte_data, 'concurrents_data': concurrents_data, 'all_url': all_url}
+           'docaposte_data': docaposte_data, 'concurrents_data': concurrents_data, 'all_url': all_url,
+           'duplicates': duplicates}
 
     return obj
 
@@ -165,35 +373,52 @@ def parse_semrank_object(results, top_concurrent=3):
 def google_search(query, site="docaposte.com", num_results=5):
     complete_query = f"{query} site:{site}"
     links = []
-    for result in search(complete_query, num_results=num_results, lang="fr"):
-        links.append(result)
+    # googlesearch fait ses propres requêtes : elles passent quand même par le limiteur partagé
+    with get_limiter().slot("www.google.com"):
+        for result in search(complete_query, num_results=num_results, lang="fr"):
+            links.append(result)
     return links
 
 
 def extract_title_and_snippet(link):
-    try:
-        response = requests.get(link, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
+    """
+    Titre et premier paragraphe d'une page : depuis le cache des pages si elle a déjà été scrapée (même périmée),
+    sinon en ne parsant que <title> et <p>, sans extraction de la structure Hn
+    """
+    cached = get_page_cache().get(page_cache_key(link))
+    if cached is not None:
+        page = cached[0]["result"]
+    else:
+        try:
+            _, _, content = http_client.stream_download(link, timeout=5)
+            soup = make_soup(content, tags=["title", "p"])
+            first_paragraph = soup.find('p')
+            page = {"title": soup.title.get_text().strip() if soup.title else '',
+                    "snippet": first_paragraph.get_text() if first_paragraph else ''}
+        except Exception as e:
+            print(f"-- Titre et extrait non récupérés pour {link} : {e}")
+            page = {"title": "", "snippet": ""}
 
-        # Extract the title of the page
-        title = soup.title.string if soup.title else "No title found"
+    # Extract the title of the page
+    title = page["title"] or "No title found"
 
-        # Extract a paragraph or snippet as a summary
-        paragraphs = soup.find_all('p')
-        snippet = paragraphs[0].get_text() if paragraphs else "No snippet found"
+    # Extract a paragraph or snippet as a summary
+    snippet = page["snippet"] or "No snippet found"
 
-        return title, snippet
-    except Exception as e:
-        return "No title found", "No snippet found"
+    return title, snippet
+
+
+def anchor_from_url(link):
+    """Texte d'ancre déduit du slug de l'url (dernière partie du chemin)"""
+    # Get last part of the article
+    last_part = link.rstrip('/').split('/')[-1]
+    return ' '.join(last_part.replace('-', ' ').replace('_', ' ').split())
 
 
 def format_ancre(links):
     formatted_links = []
     for link in links:
-        title, snippet = extract_title_and_snippet(link)
-        # Get last part of the article
-        last_part = link.rstrip('/').split('/')[-1]
-        ancre = ' '.join(last_part.replace('-', ' ').replace('_', ' ').split())
+        ancre = anchor_from_url(link)
 
         formatted_links.append(f"""Titre : '{ancre}' | Lien : {link}""")
     return "\n".join(formatted_links)
@@ -228,7 +453,8 @@ def add_hn_label(text):
 def calculate_semantic_score(text, keywords) -> int:
     """
     Calculer le score sémantique du texte à partir des mots clés donnés => proportion de mots clés existant dans
-    le contenu
+    le contenu, sans tenir compte de la casse ni des accents (cf. utils.keyword_matcher pour le détail des
+    occurrences)
     Args:
         text:
         keywords:
@@ -237,22 +463,7 @@ def calculate_semantic_score(text, keywords) -> int:
 
     """
 
-    # Lowercase texte
-    text = text.lower()
-
-    # Counter for present keywords
-    score = 0
-
-    # Loop over keywords and find if present in the content
-    for keyword in keywords:
-        occurrences = len(re.findall(r'\b' + re.escape(keyword.lower()) + r'\b', text))
-        score += (occurrences > 0) * 1
-
-    # Normalizing the score
-    max_possible_score = len(keywords)
-    normalized_score = (score / max_possible_score) * 100
-
-    return int(min(100, max(0, normalized_score)))
+    return get_keyword_matcher(tuple(keywords)).analyze(text)["score"]
 
 
 def reset_generation(step="structure"):
@@ -272,3 +483,30 @@ def reset_generation(step="structure"):
 
     elif step == "content":
         pass
+
+
+def stream_to_placeholder(placeholder, header="", min_interval=0.1):
+    """
+    Fonction on_token (cf. llmtools.invoke_llm) qui affiche le texte reçu dans un emplacement Streamlit
+
+    Utilisable depuis un thread de travail (tâches de run_dag) : le contexte de la session Streamlit est
+    rattaché au thread appelant. L'affichage est rafraîchi au plus toutes les min_interval secondes.
+
+    Args:
+        placeholder: emplacement créé avec st.empty()
+        header: texte affiché avant la réponse
+        min_interval: délai minimal entre deux rafraîchissements
+
+    """
+    ctx = get_script_run_ctx()
+    last_update = [0.0]
+
+    def on_token(text):
+        now = time.time()
+        if now - last_update[0] < min_interval:
+            return
+        last_update[0] = now
+        add_script_run_ctx(threading.current_thread(), ctx)
+        placeholder.markdown(header + text)
+
+    return on_token
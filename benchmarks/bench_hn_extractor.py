@@ -0,0 +1,104 @@
+"""
+Benchmark de l'extraction de la structure Hn (utils.tools.extract_hn_structure) contre l'ancienne
+implémentation par find_next_sibling(), sur des pages HTML synthétiques de plusieurs milliers de titres.
+Vérifie aussi que les deux implémentations donnent exactement le même résultat, sauf pour les éléments frères
+dont le nom commence par "h" sans être des titres (<header>, <hr>, <hgroup>) : l'ancienne implémentation levait
+une ValueError (int("e")) et la page entière était perdue, la nouvelle les traite comme du contenu.
+
+Usage : python benchmarks/bench_hn_extractor.py
+"""
+import os
+import random
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app"))
+
+from utils.tools import extract_hn_structure, hn_structure_to_content  # noqa: E402
+
+
+def legacy_hn_structure_and_content(soup):
+    """Ancienne implémentation de get_hn_structure_and_content"""
+    hn_structure = []
+    for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        level = tag.name
+        content = []
+        next_node = tag.find_next_sibling()
+        while next_node and (
+            not next_node.name
+            or not next_node.name.startswith("h")
+            or int(next_node.name[1]) > int(level[1])
+        ):
+            content.append(next_node.get_text(strip=True))
+            next_node = next_node.find_next_sibling()
+        content_text = " ".join(content)
+        hn_structure.append((tag.name.upper(), tag.get_text(strip=True), content_text))
+
+    all_content = ""
+    for level, title, content in hn_structure:
+        all_content += f"{level.upper()}: {title} \n\n {content}"
+
+    return hn_structure, all_content
+
+
+def synthetic_page(n_headings, nested, seed=0):
+    """Page avec n_headings titres, à plat ou imbriqués dans des <section> (3 niveaux au plus)"""
+    rng = random.Random(seed)
+    words = "signature électronique document contrat sécurité identité archivage".split()
+    parts = ["<html><head><title>Page</title></head><body><h1>Titre principal</h1>"]
+    open_sections = 0
+    for i in range(n_headings):
+        level = rng.randint(2, 6)
+        if nested and open_sections < 3 and rng.random() < 0.3:
+            parts.append("<section>")
+            open_sections += 1
+        if nested and open_sections and rng.random() < 0.2:
+            parts.append("</section>")
+            open_sections -= 1
+        parts.append(f"<h{level}>Section {i} {rng.choice(words)}</h{level}>")
+        for _ in range(rng.randint(1, 4)):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(20, 60)))
+            parts.append(f"<p>{text} <b>{rng.choice(words)}</b></p>")
+        if rng.random() < 0.2:
+            parts.append("<ul>" + "".join(f"<li>{w}</li>" for w in words) + "</ul>")
+    parts.append("</section>" * open_sections + "</body></html>")
+    return "".join(parts)
+
+
+def check_non_heading_siblings():
+    """<header> et <hr> entre deux titres : contenu de la section pour la nouvelle implémentation"""
+    soup = BeautifulSoup(
+        "<h2>A</h2><p>a</p><hr><header>En-tête</header><h3>B</h3><p>b</p><h2>C</h2>", "html.parser"
+    )
+    try:
+        legacy_hn_structure_and_content(soup)
+    except ValueError as e:
+        print(f"<header>/<hr> | ancien : ValueError ({e}), page perdue | une passe : {extract_hn_structure(soup)}")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    res = fn(*args)
+    return res, time.perf_counter() - start
+
+
+def main():
+    for n_headings in (500, 2000, 5000):
+        for nested in (False, True):
+            soup = BeautifulSoup(synthetic_page(n_headings, nested), "html.parser")
+            (legacy_structure, legacy_content), t_legacy = timed(legacy_hn_structure_and_content, soup)
+            structure, t_new = timed(extract_hn_structure, soup)
+            content, t_join = timed(hn_structure_to_content, structure)
+            assert structure == legacy_structure and content == legacy_content, "Résultats différents"
+            print(
+                f"{n_headings:>5} titres {'imbriqués' if nested else 'à plat':<9} | "
+                f"ancien : {1000 * t_legacy:8.1f} ms | une passe : {1000 * (t_new + t_join):8.1f} ms | "
+                f"x{t_legacy / (t_new + t_join):.1f}"
+            )
+    check_non_heading_siblings()
+
+
+if __name__ == "__main__":
+    main()
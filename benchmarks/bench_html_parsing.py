@@ -0,0 +1,72 @@
+"""
+Benchmark du parsing des pages concurrentes : BeautifulSoup(..., "html.parser") sur la page complète
+contre utils.htmltools.make_soup (lxml si disponible, scripts et styles retirés avant le parsing, reste du
+boilerplate retiré de l'arbre).
+
+Mesure le temps CPU et le pic mémoire Python (tracemalloc, hors allocations C de lxml) par page, pour une recherche de 10 concurrents.
+
+Usage : python benchmarks/bench_html_parsing.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app"))
+
+from utils.htmltools import get_parser, make_soup  # noqa: E402
+from utils.tools import extract_hn_structure  # noqa: E402
+
+N_PAGES = 10
+
+
+def synthetic_page(seed):
+    """Page type d'un site concurrent : scripts et styles inline, menus, puis l'article"""
+    rng = random.Random(seed)
+    words = "signature électronique document contrat sécurité identité archivage".split()
+    script = "<script>" + "var x = {'a': [1, 2, 3]};" * 2000 + "</script>"
+    style = "<style>" + ".c { color: red; margin: 0 auto; }" * 1500 + "</style>"
+    nav = "<nav><ul>" + "".join(f"<li><a href='/p{i}'>Menu {i}</a></li>" for i in range(300)) + "</ul></nav>"
+    article = []
+    for i in range(40):
+        article.append(f"<h{rng.randint(2, 4)}>Section {i}</h{rng.randint(2, 4)}>")
+        for _ in range(3):
+            article.append("<p>" + " ".join(rng.choice(words) for _ in range(80)) + "</p>")
+    return (
+        "<html><head><title>Concurrent</title><meta name='description' content='desc'>"
+        + style + script + "</head><body>" + nav + "<article><h1>Titre</h1>" + "".join(article)
+        + "</article>" + script + "<footer>" + nav + "</footer></body></html>"
+    ).encode("utf-8")
+
+
+def measure(parse, pages):
+    tracemalloc.start()
+    start = time.process_time()
+    for page in pages:
+        soup = parse(page)
+        extract_hn_structure(soup)
+        soup.find_all("p")
+    cpu = time.process_time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    pages = [synthetic_page(i) for i in range(N_PAGES)]
+    print(f"{N_PAGES} pages de {len(pages[0]) / 1024:.0f} Ko, parser par défaut : {get_parser()}")
+
+    for name, parse in [
+        ("html.parser, page complète", lambda p: BeautifulSoup(p, "html.parser")),
+        ("make_soup", make_soup),
+        ("make_soup, title et p", lambda p: make_soup(p, tags=["title", "p"])),
+    ]:
+        cpu, peak = measure(parse, pages)
+        print(f"{name:<28} CPU/page : {1000 * cpu / N_PAGES:7.1f} ms | pic mémoire : {peak / 1e6:6.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark du client HTTP mutualisé (utils.http_client) contre des appels requests "nus".
+
+Un serveur local simule semrank.io, les pages concurrentes et les pages Docaposte. Chaque nouvelle
+connexion TCP coûte HANDSHAKE_COST secondes pour simuler le handshake TCP + TLS d'un vrai site.
+
+Usage : python benchmarks/bench_http_client.py
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app"))
+
+from utils import http_client  # noqa: E402
+
+HANDSHAKE_COST = 0.03
+N_RUNS = 3
+# Une recherche = 2 appels SEMrank, 10 pages concurrentes, 5 pages Docaposte
+RUN_CALLS = [("POST", "/admin/api/keywords"), ("POST", "/admin/api/complement")]
+RUN_CALLS += [("GET", f"/concurrent/{i}") for i in range(10)]
+RUN_CALLS += [("GET", f"/docaposte/{i}") for i in range(5)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        body = b"<html><head><title>Stub</title></head><body><h1>Stub</h1><p>ok</p></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = reply
+    do_POST = reply
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    n_connections = 0
+
+    def verify_request(self, request, client_address):
+        # Appelé une fois par nouvelle connexion
+        self.n_connections += 1
+        time.sleep(HANDSHAKE_COST)
+        return True
+
+
+def run(send, base_url):
+    for method, path in RUN_CALLS:
+        send(method, base_url + path).raise_for_status()
+
+
+def bench(name, send, server, base_url):
+    server.n_connections = 0
+    start = time.perf_counter()
+    for _ in range(N_RUNS):
+        run(send, base_url)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} connexions/recherche : {server.n_connections / N_RUNS:5.1f} | "
+        f"temps/recherche : {1000 * elapsed / N_RUNS:7.1f} ms"
+    )
+    return server.n_connections / N_RUNS
+
+
+def main():
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    n_bare = bench("requests", lambda m, u: requests.request(m, u, timeout=5), server, base_url)
+    n_pooled = bench("pooled", lambda m, u: http_client.request(m, u), server, base_url)
+    print(f"Handshakes évités par recherche : {n_bare - n_pooled:.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmark de la disposition des prompts (utils.prompt_layout) face au cache de préfixes d'un serveur vLLM :
+disposition d'origine (présentation, entrées, puis consignes) contre disposition actuelle (présentation et
+consignes, contexte du mot clé, puis partie propre à l'appel).
+
+Un serveur local compatible avec l'API /v1/completions de vLLM simule le cache automatique de préfixes : le
+prompt est découpé en blocs de BLOCK_SIZE tokens, et seuls les blocs qui suivent le plus long préfixe déjà vu
+sont pré-remplis, à PREFILL_TOKENS_PER_SECOND tokens par seconde. Le temps jusqu'au premier token (TTFT) est
+mesuré côté client sur la réponse en flux (server-sent events), pour la suite d'appels d'une génération
+d'article : structure, sections (3 versions en contexte borné), reformulations et résumé, pour plusieurs mots
+clés.
+
+Usage : python benchmarks/bench_prefix_cache.py
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app"))
+
+from utils import llmtools  # noqa: E402
+from utils.rolling_context import RollingContext  # noqa: E402
+from utils.token_budget import format_examples  # noqa: E402
+
+BLOCK_SIZE = 16
+CACHE_BLOCKS = 50000
+PREFILL_TOKENS_PER_SECOND = 20000
+BASE_LATENCY = 0.005
+N_KEYWORDS = 2
+N_SECTIONS = 8
+EXAMPLE_WORDS = 800
+token_regex = re.compile(r"\w+|[^\w\s]")
+VOCABULARY = (
+    "signature électronique document contrat sécurité identité numérique archivage valeur juridique "
+    "règlement eIDAS certificat horodatage coffre-fort dématérialisation facture processus entreprise "
+    "collaborateur RH confiance données personnelles RGPD authentification cachet serveur cloud souverain"
+).split()
+
+
+class PrefixCache:
+    """Cache de blocs de tokens, identifiés par le hachage de tout le préfixe qui les précède (comme vLLM)"""
+
+    def __init__(self, capacity):
+        self.blocks = OrderedDict()
+        self.capacity = capacity
+        self.lock = threading.Lock()
+
+    def prefill(self, prompt):
+        """Nombre de tokens du prompt et nombre de tokens déjà en cache, puis mise en cache de tous les blocs"""
+        tokens = token_regex.findall(prompt)
+        hashes = []
+        h = 0
+        for i in range(0, len(tokens) - len(tokens) % BLOCK_SIZE, BLOCK_SIZE):
+            h = hash((h, tuple(tokens[i:i + BLOCK_SIZE])))
+            hashes.append(h)
+        with self.lock:
+            cached = 0
+            for h in hashes:
+                if h not in self.blocks:
+                    break
+                cached += 1
+            for h in hashes:
+                self.blocks[h] = True
+                self.blocks.move_to_end(h)
+            while len(self.blocks) > self.capacity:
+                self.blocks.popitem(last=False)
+
+        return len(tokens), cached * BLOCK_SIZE
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        n_tokens, n_cached = self.server.cache.prefill(payload["prompt"])
+        self.server.stats.append((n_tokens, n_cached))
+        time.sleep(BASE_LATENCY + (n_tokens - n_cached) / PREFILL_TOKENS_PER_SECOND)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for text in ("Réponse", " simulée", "."):
+            self.write_chunk(f"data: {json.dumps({'choices': [{'text': text}]})}\n\n")
+            time.sleep(0.001)
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data):
+        data = data.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class CompletionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), CompletionHandler)
+        self.cache = PrefixCache(CACHE_BLOCKS)
+        self.stats = []
+
+
+def legacy_layout(role, instructions, context, delta, answer="### Réponse :"):
+    """Disposition d'origine des prompts : présentation, entrées, puis sortie attendue et consignes"""
+    entries = [f"{i + 1}. **{title}** :\n{value}" for i, (title, value) in enumerate(list(context) + list(delta))]
+    return "\n\n".join([role.strip(), "### Entrées :", *entries, instructions.strip(), answer]) + "\n"
+
+
+def make_text(rng, n_words):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(n_words)) + "."
+
+
+def article_prompts(rng, keyword):
+    """Prompts d'une génération d'article, dans l'ordre des appels : (type d'appel, prompt)"""
+    examples = format_examples([make_text(rng, EXAMPLE_WORDS) for _ in range(3)])
+    questions = " ; ".join(f"{keyword} {make_text(rng, 6)} ?" for _ in range(5))
+    mots_cles = ", ".join(make_text(rng, 2)[:-1] for _ in range(20))
+    intention = make_text(rng, 40)
+    structure = [["h1", keyword]] + [["h2", make_text(rng, 5)] for _ in range(N_SECTIONS)]
+    list_ancre = "\n".join(f"Titre : '{make_text(rng, 4)}' | Lien : https://www.docaposte.com/{i}" for i in range(5))
+
+    prompts = [
+        ("structure", llmtools.generate_prompt_structure(keyword, examples, questions, structure)),
+    ]
+    contexts = [RollingContext(": ".join(structure[0])) for _ in llmtools.VERSION_STYLES]
+    for part in structure[1:]:
+        part_cible = ": ".join(part)
+        for context, style in zip(contexts, llmtools.VERSION_STYLES):
+            prompts.append(
+                (
+                    "section",
+                    llmtools.generate_prompt_section(
+                        keyword, structure, examples, intention, mots_cles, questions,
+                        context.render(), part_cible, style,
+                    ),
+                )
+            )
+            context.update(part_cible, make_text(rng, 250))
+    drafts = [make_text(rng, 250 * N_SECTIONS) for _ in llmtools.VERSION_STYLES]
+    for draft, style in zip(drafts, llmtools.VERSION_STYLES):
+        prompts.append(
+            (
+                "reformulation",
+                llmtools.generate_prompt_reformulate_content(
+                    keyword, structure, examples, 1500, intention, mots_cles, questions, list_ancre, draft, style
+                ),
+            )
+        )
+    prompts.append(("summary", llmtools.generate_prompt_summary(keyword, drafts[0], intention, list_ancre)))
+
+    return prompts
+
+
+def run(layout):
+    """TTFT moyen par type d'appel et part des tokens servis depuis le cache, avec un serveur neuf"""
+    llmtools.layout_prompt = layout
+    rng = random.Random(0)
+    prompts = [p for k in range(N_KEYWORDS) for p in article_prompts(rng, f"mot clé {k}")]
+
+    server = CompletionServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/completions"
+    ttft = defaultdict(list)
+    with httpx.Client(timeout=60) as client:
+        for kind, prompt in prompts:
+            start = time.perf_counter()
+            payload = {"model": "mixtral", "prompt": prompt, "max_tokens": 16, "stream": True}
+            with client.stream("POST", url, json=payload) as response:
+                first = True
+                for line in response.iter_lines():
+                    if first and line.startswith("data: ") and line != "data: [DONE]":
+                        ttft[kind].append(time.perf_counter() - start)
+                        first = False
+    server.shutdown()
+    n_tokens = sum(t for t, _ in server.stats)
+    n_cached = sum(c for _, c in server.stats)
+
+    return ttft, n_cached / n_tokens, n_tokens
+
+
+def main():
+    layout = llmtools.layout_prompt
+    results = {"origine": run(legacy_layout), "actuelle": run(layout)}
+    llmtools.layout_prompt = layout
+
+    for name, (ttft, cached_share, n_tokens) in results.items():
+        print(
+            f"disposition {name:8} | {n_tokens} tokens, {int(100 * cached_share)} % en cache | TTFT moyen : "
+            + ", ".join(f"{kind} {1000 * sum(t) / len(t):.0f} ms" for kind, t in ttft.items())
+            + f" | total {sum(sum(t) for t in ttft.values()):.2f} s"
+        )
+    legacy_total = sum(sum(t) for t in results["origine"][0].values())
+    current_total = sum(sum(t) for t in results["actuelle"][0].values())
+    print(f"TTFT cumulé x{legacy_total / current_total:.1f}")
+
+
+if __name__ == "__main__":
+    main()
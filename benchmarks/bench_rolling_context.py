@@ -0,0 +1,106 @@
+"""
+Benchmark de la rédaction section par section (get_all_content_proposals) : contexte complet (3 débuts
+d'article entiers dans chaque prompt) contre contexte borné (résumé courant, dernière section, sections
+traitées), sur des structures de 10 et 20 sections.
+
+Le LLM est simulé : il renvoie 3 propositions de SECTION_WORDS mots, avec une latence proportionnelle à la
+taille du prompt (pré-remplissage) plus un temps fixe de génération. Les tokens sont comptés avec le compteur du
+modèle mistral (cf. TOKEN_BUDGET dans config.yml).
+
+Usage : python benchmarks/bench_rolling_context.py
+"""
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "app"))
+
+from langchain_core.language_models.llms import LLM  # noqa: E402
+
+from utils.llmtools import PartContent, build_chain, get_all_content_proposals  # noqa: E402
+from utils.token_budget import format_examples, get_token_counter  # noqa: E402
+
+SECTION_WORDS = 250
+EXAMPLE_WORDS = 800
+# Débit de pré-remplissage et temps de génération simulés (accélérés pour que le benchmark reste court)
+PREFILL_TOKENS_PER_SECOND = 50000
+GENERATION_SECONDS = 0.02
+VOCABULARY = (
+    "signature électronique document contrat sécurité identité numérique archivage valeur juridique "
+    "règlement eIDAS certificat horodatage coffre-fort dématérialisation facture processus entreprise "
+    "collaborateur RH confiance données personnelles RGPD authentification cachet serveur cloud souverain"
+).split()
+
+
+def make_text(rng, n_words):
+    sentences = []
+    while n_words > 0:
+        n = min(n_words, rng.randint(12, 25))
+        sentences.append(" ".join(rng.choice(VOCABULARY) for _ in range(n)).capitalize() + ".")
+        n_words -= n
+    return " ".join(sentences)
+
+
+class SimulatedLLM(LLM):
+    counter: Any
+    rng: Any
+    prompt_tokens: List[int] = []
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        tokens = self.counter.count(prompt)
+        self.prompt_tokens.append(tokens)
+        time.sleep(tokens / PREFILL_TOKENS_PER_SECOND + GENERATION_SECONDS)
+        return json.dumps({"content": [make_text(self.rng, SECTION_WORDS) for _ in range(3)]}, ensure_ascii=False)
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+
+def run(n_sections, context_mode, examples, counter):
+    llm = SimulatedLLM(counter=counter, rng=random.Random(1), prompt_tokens=[])
+    chain = build_chain(llm, PartContent, guided=False)
+    structure = [["h1", "La signature électronique"]] + [
+        ["h2" if i % 3 == 0 else "h3", f"Section {i + 1}"] for i in range(n_sections)
+    ]
+    start = time.perf_counter()
+    articles = get_all_content_proposals(
+        chain,
+        "signature électronique",
+        structure,
+        examples,
+        "comprendre la signature électronique",
+        "signature, contrat, eIDAS",
+        "Quelle est la valeur juridique d'une signature électronique ?",
+        context_mode=context_mode,
+    )
+    elapsed = time.perf_counter() - start
+    assert len(articles) == 3 and all(a.count("Section ") == n_sections for a in articles)
+
+    return llm.prompt_tokens, elapsed
+
+
+def main():
+    rng = random.Random(0)
+    counter = get_token_counter("mistral")
+    examples = format_examples([make_text(rng, EXAMPLE_WORDS) for _ in range(3)])
+
+    for n_sections in (10, 20):
+        results = {mode: run(n_sections, mode, examples, counter) for mode in ("full", "rolling")}
+        for mode, (prompt_tokens, elapsed) in results.items():
+            print(
+                f"{n_sections} sections | {mode:7} | prompts : {sum(prompt_tokens):7d} tokens au total, "
+                f"{prompt_tokens[0]:6d} -> {prompt_tokens[-1]:6d} tokens par appel | {elapsed:5.2f} s"
+            )
+        full, rolling = results["full"], results["rolling"]
+        print(
+            f"{n_sections} sections | tokens x{sum(full[0]) / sum(rolling[0]):.1f} | "
+            f"temps x{full[1] / rolling[1]:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+from langchain_community.llms.fake import FakeListLLM
+
+from utils.llmtools import PartContent, StructureHn, Title, build_chain
+
+
+class FakeVLLM(FakeListLLM):
+    """LLM de test vu comme le modèle vLLM enveloppé dans le cache (décodage guidé par guided_json)"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "cached-vllm-openai"
+
+
+def guided_json(chain):
+    return chain.middle[0].kwargs["extra_body"]["guided_json"]
+
+
+def test_build_chain_twice_gives_same_schema():
+    llm = FakeVLLM(responses=["{}"])
+    for output_class in (StructureHn, Title):
+        first = guided_json(build_chain(llm, output_class, guided=True))
+        second = guided_json(build_chain(llm, output_class, guided=True))
+        assert first == second
+        assert list(next(iter(first["properties"].values()))["properties"]) == [
+            "proposition_1",
+            "proposition_2",
+            "proposition_3",
+        ]
+
+
+def test_build_chain_leaves_pydantic_schema_untouched():
+    llm = FakeVLLM(responses=["{}"])
+    build_chain(llm, StructureHn, guided=True)
+    build_chain(llm, PartContent, guided=True, n_proposals=1)
+
+    assert "additionalProperties" in StructureHn.schema()["properties"]["structure"]
+    assert "minItems" not in PartContent.schema()["properties"]["content"]
+    schema = guided_json(build_chain(llm, PartContent, guided=True))
+    assert schema["properties"]["content"]["minItems"] == 3
@@ -0,0 +1,45 @@
+import pytest
+
+from utils.htmltools import make_soup, strip_raw_blocks
+
+PARSERS = ["lxml", "html.parser"]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_self_closing_boilerplate_keeps_content(parser):
+    soup = make_soup('<svg class="i"/><h2>Titre</h2><p>Contenu important</p></svg>', parser=parser)
+    assert soup.find("h2").get_text() == "Titre"
+    assert soup.find("p").get_text() == "Contenu important"
+
+    soup = make_soup('<p>avant</p><iframe src="x"/><p>après</p>', parser=parser)
+    assert [p.get_text() for p in soup.find_all("p")] == ["avant", "après"]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_boilerplate_removed(parser):
+    markup = (
+        b"<html><head><title>T</title><style>.c { color: red; }</style></head><body>"
+        b"<nav><p>Menu</p></nav><!-- commentaire --><SCRIPT type='x'>var a = '<p>';</script >"
+        b"<nav-menu><p>Menu personnalis\xc3\xa9</p></nav-menu><p>Article</p><svg><text>icone</text></svg></body></html>"
+    )
+    soup = make_soup(markup, parser=parser)
+    assert [p.get_text() for p in soup.find_all("p")] == ["Menu personnalisé", "Article"]
+    assert "icone" not in soup.get_text() and "commentaire" not in str(soup)
+
+
+def test_strip_raw_blocks_stops_at_unclosed_block():
+    assert strip_raw_blocks("<p>a</p><script>x</script><p>b</p><script>ouvert <p>c</p>") == (
+        "<p>a</p><p>b</p><script>ouvert <p>c</p>"
+    )
+    assert strip_raw_blocks(b"<p>a</p><!-- ouvert <style>s</style>") == b"<p>a</p><!-- ouvert <style>s</style>"
+    # Un bloc non fermé ne relance pas une recherche sur toute la fin de la page à chaque ouverture
+    assert strip_raw_blocks("<script>" * 50000) == "<script>" * 50000
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_tags_filter(parser):
+    markup = "<title>Titre</title><nav><p>Menu</p></nav><div><h2>Section</h2><p>Premier</p><p>Second</p></div>"
+    soup = make_soup(markup, tags=["title", "p"], parser=parser)
+    assert soup.title.get_text() == "Titre"
+    assert [p.get_text() for p in soup.find_all("p")] == ["Premier", "Second"]
+    assert soup.find("h2") is None
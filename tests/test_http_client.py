@@ -0,0 +1,36 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from utils.http_client import DownloadSkipped, stream_download
+
+
+@pytest.fixture
+def stalled_server():
+    """Serveur qui envoie les en-têtes et un premier morceau du contenu, puis ne répond plus"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    stop = threading.Event()
+
+    def serve():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 100000\r\n\r\n<p>debut")
+        stop.wait(10)
+        conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/"
+    stop.set()
+    server.close()
+
+
+def test_stalled_server_cut_off_by_max_duration(stalled_server):
+    start = time.monotonic()
+    with pytest.raises(DownloadSkipped) as e:
+        stream_download(stalled_server, timeout=(5, 30), max_duration=1)
+    assert e.value.reason == "timeout"
+    assert time.monotonic() - start < 3
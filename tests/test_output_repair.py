@@ -0,0 +1,77 @@
+import json
+
+from langchain_community.llms.fake import FakeListLLM
+
+from utils.llmtools import PartContent, StructureHn, Summary, Title, build_chain, get_part_content_proposals
+from utils.output_repair import repair_output
+
+PAIRS = {
+    "proposition_1": [["h1", "Signer un document"], ["h2", "Les étapes"]],
+    "proposition_2": [["h1", "La signature électronique"], ["h2", "Valeur juridique"]],
+    "proposition_3": [["h1", "Signer en ligne"], ["h2", "Sécurité"]],
+}
+
+
+def test_prose_around_json():
+    text = (
+        "Voici les trois propositions demandées :\n"
+        + json.dumps({"content": ["Texte 1", "Texte 2", "Texte 3"]}, ensure_ascii=False)
+        + "\nN'hésitez pas si vous avez besoin d'autres propositions."
+    )
+
+    assert repair_output(text, PartContent).content == ["Texte 1", "Texte 2", "Texte 3"]
+
+
+def test_single_quotes():
+    text = "{'summary': ['Résumé 1', 'Résumé 2', 'Résumé 3',]}"
+
+    assert repair_output(text, Summary).summary == ["Résumé 1", "Résumé 2", "Résumé 3"]
+
+
+def test_truncated_last_element_is_dropped():
+    text = '{"content": ["Texte complet 1", "Texte complet 2", "Texte coup'
+
+    assert repair_output(text, PartContent).content == ["Texte complet 1", "Texte complet 2"]
+
+
+def test_dict_of_pairs():
+    text = "```json\n" + json.dumps({"structure": PAIRS}, ensure_ascii=False) + "\n```"
+    assert repair_output(text, StructureHn).structure == PAIRS
+
+    # Titres sans l'objet englobant, avec un élément en trop dans une paire
+    text = json.dumps(
+        {
+            "proposition_1": ["Titre 1", "Description 1"],
+            "proposition_2": ["Titre 2", "Description 2", "en trop"],
+            "proposition_3": ["Titre 3", "Description 3"],
+        }
+    )
+    assert repair_output(text, Title).title == {
+        "proposition_1": ["Titre 1", "Description 1"],
+        "proposition_2": ["Titre 2", "Description 2"],
+        "proposition_3": ["Titre 3", "Description 3"],
+    }
+
+
+def test_no_json():
+    assert repair_output("Je ne peux pas répondre.", PartContent) is None
+    assert repair_output("", PartContent) is None
+
+
+def test_build_chain_twice():
+    answer = "Voici la réponse : {'structure': " + json.dumps(PAIRS, ensure_ascii=False) + "}"
+    for _ in range(2):
+        chain = build_chain(FakeListLLM(responses=[answer]), StructureHn, guided=False)
+        assert chain.invoke({"query": "structure"}).structure == PAIRS
+
+
+def test_partial_proposals_merged_without_exceeding_three():
+    for responses in (
+        ['{"content": ["a", "b"]}', '{"content": ["c", "d"]}'],
+        ['{"content": ["a", "b", "c", "d"]}'],
+    ):
+        chain = build_chain(FakeListLLM(responses=responses), PartContent, guided=False)
+        proposals = get_part_content_proposals(
+            chain, "sujet", "hn", "exemples", "intention", "mots", "questions", "", "h2"
+        )
+        assert proposals == ["a", "b", "c"]
@@ -0,0 +1,16 @@
+import pytest
+
+from utils.ratelimit import HostLimiter, RateLimited
+
+
+def test_zero_rate_blocks_host():
+    limiter = HostLimiter(max_in_flight=2, default_rate=2, default_burst=2, max_wait=1, hosts={"bloque": {"RATE": 0}})
+    for _ in range(3):
+        with pytest.raises(RateLimited):
+            with limiter.slot("bloque"):
+                pass
+    with limiter.slot("autre"):
+        pass
+
+    assert limiter.stats()["hosts"]["bloque"]["rejected"] == 3
+    assert limiter.stats()["hosts"]["autre"]["requests"] == 1
@@ -0,0 +1,16 @@
+from bs4 import BeautifulSoup
+
+from utils.tools import extract_hn_structure
+
+
+def test_non_heading_siblings_starting_with_h_are_content():
+    soup = BeautifulSoup(
+        "<h2>A</h2><p>a</p><hr><header>En-tête</header><h3>B</h3><p>b</p><h2>C</h2><hgroup>Groupe</hgroup>",
+        "lxml",
+    )
+
+    assert extract_hn_structure(soup) == [
+        ("H2", "A", "a  En-tête B b"),
+        ("H3", "B", "b"),
+        ("H2", "C", "Groupe"),
+    ]